@@ -1,61 +1,1569 @@
 import dash
-from dash import dcc, html, dash_table, Input, Output, callback, State, ALL
+from dash import dcc, html, dash_table, Input, Output, callback, State, ALL, ClientsideFunction
+import io
 import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.request
+import urllib.error
+import flask
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from datetime import datetime, date, timedelta
+from types import MappingProxyType
 import base64
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import gzip
 import hashlib
+import shutil
+import inspect
+
+# Parquet exige pyarrow; sem ele o snapshot local é gravado em pickle
+try:
+    import pyarrow  # noqa: F401
+    SNAPSHOT_FORMAT = 'parquet'
+except ImportError:
+    SNAPSHOT_FORMAT = 'pickle'
+
+# Compressão brotli é opcional (pacote brotli); sem ele as respostas usam gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Lock entre processos (escolha do processo que baixa a planilha): fcntl no Linux, msvcrt no Windows
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# URL para exportar a planilha como CSV (primeira aba por padrão)
+#SHEET_CSV_URL = "https://docs.google.com/spreadsheets/d/1f_SGg-gpfMOyo3q46dw5QHCTIr0HKyXa9KGYSLZQMV0/export?format=csv" # planilha teste na conta Alex
+SHEET_CSV_URL = "https://docs.google.com/spreadsheets/d/1Xgt603LlZMQcj1AXrIf4mdRAxDcQbWz9t9H556XgbZ4/export?format=csv" # planilha em produção na conta Gisélia
+SHEET_CSV_URL = os.environ.get('LEADS_SHEET_URL', SHEET_CSV_URL)
+
+# Origem dos dados: 'google' (export CSV da planilha), 'file' (CSV/Parquet local) ou 'sqlite'
+DATA_SOURCE = os.environ.get('LEADS_SOURCE', 'google')
+DATA_SOURCE_PATH = os.environ.get('LEADS_SOURCE_PATH', '')
+SQLITE_TABLE = os.environ.get('LEADS_SQLITE_TABLE', 'Resumo')
+
+# Várias abas (Nomeaba) lidas em paralelo: lista "nome=gid" separada por vírgula, ex.
+# LEADS_SHEET_GIDS="Janeiro=0,Fevereiro=123456". Vazio = somente o export consolidado.
+# Para LEADS_SOURCE=file, LEADS_SOURCE_PATH pode listar vários arquivos separados por os.pathsep.
+SHEET_GIDS = os.environ.get('LEADS_SHEET_GIDS', '')
+FETCH_WORKERS = int(os.environ.get('LEADS_FETCH_WORKERS', '4'))
+# Tempo máximo por aba (segundos); aba que estourar mantém os últimos dados lidos
+SOURCE_TIMEOUT = float(os.environ.get('LEADS_SOURCE_TIMEOUT', '30'))
+
+# Snapshot local do último DataFrame normalizado (permite iniciar sem depender da rede)
+CACHE_DIR = os.environ.get('LEADS_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+SNAPSHOT_META_FILE = os.path.join(CACHE_DIR, 'resumo.meta.json')
+# Vários processos (workers do gunicorn): só quem detém o lock baixa a planilha; os demais
+# recarregam o snapshot gravado por ele. "Atualizar dados" em qualquer processo toca o arquivo de pedido.
+REFRESH_LOCK_FILE = os.path.join(CACHE_DIR, 'refresh.lock')
+REFRESH_REQUEST_FILE = os.path.join(CACHE_DIR, 'refresh.request')
+# Versões publicadas gravadas em arquivos .npy mapeados em memória (somente leitura) pelos
+# processos; o arquivo CURRENT aponta a versão vigente (pasta com o hash do conteúdo)
+SHARED_DIR = os.path.join(CACHE_DIR, 'shared')
+# Lock, pedido por arquivo e SHARED_DIR só valem com vários processos: o serve.py liga
+# quando o gunicorn roda com mais de um worker. Com um processo (waitress, servidor de
+# desenvolvimento) a thread de atualização apenas coleta e publica em memória.
+SHARED_STORE = os.environ.get('LEADS_SHARED_STORE', '0') == '1'
+FETCH_TIMEOUT = int(os.environ.get('LEADS_FETCH_TIMEOUT', '60'))
+
+# Atualização em segundo plano: intervalo entre coletas (segundos, 0 = só sob demanda),
+# intervalo de verificação de nova versão entre processos (segundos) e pelo navegador
+# (segundos; a consulta é um JSON pequeno, com 304 quando nada mudou)
+REFRESH_INTERVAL = int(os.environ.get('LEADS_REFRESH_INTERVAL', '600'))
+VERSION_POLL_INTERVAL = int(os.environ.get('LEADS_VERSION_POLL_INTERVAL', '5'))
+BROWSER_POLL_INTERVAL = int(os.environ.get('LEADS_BROWSER_POLL_INTERVAL', '30'))
+
+# Ingestão incremental: colunas derivadas recalculadas só para as linhas inseridas/alteradas
+# (casadas por numregistro + hash da linha); 0 = sempre recalcular todas
+INCREMENTAL_INGEST = os.environ.get('LEADS_INCREMENTAL', '1') != '0'
+
+# Compressão das respostas (0 = desligada, ex.: atrás de um proxy que já comprime), a partir
+# de LEADS_COMPRESS_MIN_SIZE bytes; estáticos com impressão digital ficam um ano em cache
+COMPRESS_RESPONSES = os.environ.get('LEADS_COMPRESS', '1') != '0'
+COMPRESS_MIN_SIZE = int(os.environ.get('LEADS_COMPRESS_MIN_SIZE', '1024'))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/javascript', 'application/x-javascript', 'image/svg+xml'}
+STATIC_MAX_AGE = 365 * 24 * 3600
+# Conteúdos estáticos distintos com corpo comprimido guardado em memória (LRU)
+STATIC_CACHE_ENTRIES = 32
+
+# Linhas por página da tabela de contatos em atraso (paginação, ordenação e filtro no servidor)
+OVERDUE_PAGE_SIZE = int(os.environ.get('LEADS_OVERDUE_PAGE_SIZE', '25'))
+
+# Cache de resultados dos callbacks: máximo de entradas (LRU), descartado a cada nova versão
+RESULT_CACHE_SIZE = int(os.environ.get('LEADS_RESULT_CACHE_SIZE', '256'))
+
+# Esquema da aba Resumo (colunas A–L do escopo): tipo usado na leitura do CSV.
+# 'category' para colunas de baixa cardinalidade, 'date' para dd/mm/aaaa
+SHEET_SCHEMA = {
+    'numregistro': 'key',
+    'Empresa': 'str',
+    'Consultora': 'category',
+    'Positivo': 'category',
+    'Contato via wp': 'category',
+    'Proposta': 'category',
+    'Responsável': 'str',
+    'Contato': 'str',
+    'Histórico': 'str',
+    'Qualificado': 'category',
+    'Nomeaba': 'category',
+    'DataReferencia': 'date',
+}
+CATEGORY_COLUMNS = [c for c, t in SHEET_SCHEMA.items() if t == 'category']
+
+# Colunas que nenhuma visão usa: não são carregadas
+PRUNED_COLUMNS = {'Responsável', 'Contato'}
+
+# Campos lógicos -> cabeçalhos aceitos na planilha. O primeiro nome é o usado no código:
+# na ingestão as colunas são renomeadas para ele (comparação sem diferenciar maiúsculas;
+# se não houver correspondência exata, aceita um único cabeçalho que contenha um dos nomes
+# como palavra inteira)
+FIELD_ALIASES = {
+    'numregistro': ['numregistro'],
+    'empresa': ['Empresa'],
+    'consultora': ['Consultora'],
+    'positivo': ['Positivo', 'Positivo?'],
+    'contato_wp': ['Contato via wp', 'Contato via WhatsApp', 'Contato via Whatsapp', 'ContatoWP'],
+    'proposta': ['Proposta', 'Proposta Enviada'],
+    'responsavel': ['Responsável', 'Responsavel'],
+    'contato': ['Contato'],
+    'historico': ['Histórico', 'Historico'],
+    'qualificado': ['Qualificado', 'Qualificado?'],
+    'nomeaba': ['Nomeaba', 'NomeAba'],
+    'data_referencia': ['DataReferencia', 'Data de Referencia', 'Data Referencia'],
+}
+
+# Linhas por bloco na leitura do CSV
+CSV_CHUNK_ROWS = int(os.environ.get('LEADS_CSV_CHUNK_ROWS', '50000'))
+
+# Colunas calculadas na ingestão (não fazem parte da planilha nem do hash da linha)
+# _positivo: 1 = Sim, 0 = Não, -1 = vazio/outro; _qualificado: 2 = Sim, 1 = Talvez, 0 = Não
+# _motivo: motivo classificado a partir do Histórico (category, ver MotivoClassifier)
+DERIVED_COLUMNS = ['_row_hash', '_positivo', '_contato_wp', '_proposta', '_qualificado', '_motivo']
+
+# Códigos de _qualificado
+QUALIFICADO_NAO, QUALIFICADO_TALVEZ, QUALIFICADO_SIM = 0, 1, 2
+QUALIFICADO_LABELS = {QUALIFICADO_SIM: 'Sim', QUALIFICADO_TALVEZ: 'Talvez', QUALIFICADO_NAO: 'Não'}
+
+# Métricas do cubo diário (dia x consultora); as três últimas seguem os códigos de Qualificado
+CUBE_METRICS = ('total', 'positivos', 'negativos', 'contato_wp', 'proposta', 'qual_nao', 'qual_talvez', 'qual_sim', 'com_empresa')
+M_TOTAL, M_POSITIVOS, M_NEGATIVOS, M_CONTATO_WP, M_PROPOSTA = range(5)
+M_QUALIFICADO = 5  # M_QUALIFICADO + código (QUALIFICADO_NAO/TALVEZ/SIM)
+M_COM_EMPRESA = 8  # registros com Empresa preenchida (leads da série temporal)
+
+# Série temporal: resolução escolhida pelo tamanho do período (até N dias = diária, até M = semanal,
+# acima = mensal) e limite de pontos por linha enviados ao navegador (acima dele, LTTB)
+SERIES_DAILY_MAX_DAYS = 180
+SERIES_WEEKLY_MAX_DAYS = 3 * 365
+SERIES_MAX_POINTS = int(os.environ.get('LEADS_SERIES_MAX_POINTS', '400'))
+
+# Motivos (coluna Histórico): regras em JSON, em ordem de prioridade; sem o arquivo valem as padrão
+MOTIVOS_FILE = os.environ.get('LEADS_MOTIVOS_FILE', os.path.join(BASE_DIR, 'motivos.json'))
+DEFAULT_MOTIVO_RULES = [
+    ('não tem sistema', ['não tem sistema', 'nao tem sistema', 'sem sistema']),
+    ('sem interesse', ['sem interesse', 'não interessado', 'nao interessado', 'sem interesse no momento']),
+    ('responsável ausente', ['responsável ausente', 'responsavel ausente', 'sem responsável', 'sem responsavel']),
+    ('preço', ['preço', 'preco', 'caro', 'muito caro']),
+    # sem motivo específico, qualquer negativa conta como falta de interesse
+    ('sem interesse', ['nao', 'não']),
+]
+MOTIVO_SEM_RESPOSTA = 'sem resposta'
+MOTIVO_OUTROS = 'outros'
+
+# Snapshot atualmente em memória: {'df': DataFrame, 'meta': dict}
+_snapshot = {'df': None, 'meta': {}}
+
+
+def resolve_columns(columns):
+    """Resolve os cabeçalhos recebidos para os nomes usados no código (FIELD_ALIASES).
+    Retorna a lista de nomes na mesma ordem; colunas não reconhecidas ficam só com strip.
+    A coluna A (numregistro) não tem cabeçalho na aba Resumo."""
+    names = [str(c).strip() for c in columns]
+    lowered = [n.lower() for n in names]
+    claimed = set()
+    if names and (names[0] == '' or names[0].startswith('Unnamed')):
+        names[0] = 'numregistro'
+        claimed.add(0)
+
+    unresolved = []
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            a = alias.lower()
+            i = next((i for i, c in enumerate(lowered) if c == a and i not in claimed), None)
+            if i is not None:
+                if names[i] != aliases[0]:
+                    print(f"Coluna '{names[i]}' reconhecida como '{aliases[0]}'")
+                names[i] = aliases[0]
+                claimed.add(i)
+                break
+        else:
+            unresolved.append(field)
+
+    # tentativas parciais: cabeçalho que contém um dos nomes aceitos como palavra inteira
+    # (separada por espaço/pontuação: "Proposta Enviada em" sim, "DataContato" não), aceita
+    # só quando um único cabeçalho livre corresponde
+    for field in unresolved:
+        aliases = FIELD_ALIASES[field]
+        if aliases[0] in names:
+            continue
+        for alias in aliases:
+            word = re.compile(r'(?<![^\W_])' + re.escape(alias.lower()) + r'(?![^\W_])')
+            matches = [i for i, c in enumerate(lowered) if i not in claimed and word.search(c)]
+            if len(matches) == 1:
+                i = matches[0]
+                print(f"Coluna '{names[i]}' reconhecida como '{aliases[0]}'")
+                names[i] = aliases[0]
+                claimed.add(i)
+                break
+    return names
+
+
+def build_schema(columns):
+    """Mapeamento imutável campo lógico -> coluna do DataFrame (None se ausente)."""
+    present = set(columns)
+    return MappingProxyType({field: (aliases[0] if aliases[0] in present else None)
+                             for field, aliases in FIELD_ALIASES.items()})
+
+
+def apply_schema_dtypes(df):
+    """Garante os tipos do esquema (categorias, datas e chave numérica) em um DataFrame já carregado."""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if 'DataReferencia' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['DataReferencia']):
+        raw = df['DataReferencia']
+        parsed = pd.to_datetime(raw, format='%d/%m/%Y', errors='coerce')
+        # origens como SQLite podem guardar a data em ISO (aaaa-mm-dd)
+        missing = parsed.isna() & raw.notna()
+        if missing.any():
+            parsed[missing] = pd.to_datetime(raw[missing], format='ISO8601', errors='coerce')
+        df['DataReferencia'] = parsed
+    if 'numregistro' in df.columns and df['numregistro'].dtype == object:
+        key = pd.to_numeric(df['numregistro'], errors='coerce')
+        if key.notna().sum() == df['numregistro'].notna().sum():
+            df['numregistro'] = key.astype('Int64')
+    return df
 
-# Configuração do Google Sheets
-def get_google_sheets_data():
-    """
-    Função para conectar ao Google Sheets e buscar dados da aba 'Resumo'
-    Usando export CSV sem necessidade de API ou credenciais
-    """
-    
-    # URL para exportar a planilha como CSV (primeira aba por padrão)
-    #csv_url = "https://docs.google.com/spreadsheets/d/1f_SGg-gpfMOyo3q46dw5QHCTIr0HKyXa9KGYSLZQMV0/export?format=csv" # planilha teste na conta Alex
-    csv_url = "https://docs.google.com/spreadsheets/d/1Xgt603LlZMQcj1AXrIf4mdRAxDcQbWz9t9H556XgbZ4/export?format=csv" # planilha em produção na conta Gisélia
-               
-    
-    # Ler dados diretamente do CSV
-    df = pd.read_csv(csv_url)
-    
-    # Normalizar nomes de colunas: strip e mapear variações comuns
-    df.columns = df.columns.str.strip()
-    # Mapear nomes diferentes para os nomes usados no código
-    col_map = {}
-    if 'Consultora ' in df.columns:
-        col_map['Consultora '] = 'Consultora'
-    if 'Consultora' in df.columns:
-        col_map['Consultora'] = 'Consultora'
-    if 'Historico' in df.columns:
-        col_map['Historico'] = 'Histórico'
-    if 'Histórico' in df.columns:
-        col_map['Histórico'] = 'Histórico'
-    if 'NomeAba' in df.columns:
-        col_map['NomeAba'] = 'Nomeaba'
-    # Aplicar mapeamento somente para colunas existentes
-    existing_map = {k: v for k, v in col_map.items() if k in df.columns}
-    if existing_map:
-        df = df.rename(columns=existing_map)
-    
+
+def _print_load_summary(df):
     # Imprimir colunas disponíveis para debug
     print("Colunas disponíveis na planilha:")
     print(df.columns.tolist())
     print(f"Shape do DataFrame: {df.shape}")
-    
-    # Converter DataReferencia para datetime, assumindo formato dd/mm/yyyy
-    if 'DataReferencia' in df.columns:
-        df['DataReferencia'] = pd.to_datetime(df['DataReferencia'], format='%d/%m/%Y', errors='coerce')
-    
+
+
+def normalize_sheet_dataframe(df):
+    """Normaliza nomes de colunas e aplica o esquema da aba Resumo a um DataFrame já lido."""
+    df.columns = resolve_columns(df.columns)
+    df = df.drop(columns=[c for c in df.columns if c in PRUNED_COLUMNS])
+    df = apply_schema_dtypes(df)
+    _print_load_summary(df)
+    return df
+
+
+def read_sheet_csv(source):
+    """Lê o export CSV da aba Resumo com esquema explícito.
+
+    Lê em blocos de CSV_CHUNK_ROWS linhas, somente as colunas usadas, com as colunas de
+    baixa cardinalidade já como category e DataReferencia convertida bloco a bloco.
+    `source` pode ser bytes (conteúdo baixado) ou caminho de arquivo.
+    """
+    def open_source():
+        return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+    header = pd.read_csv(open_source(), nrows=0).columns
+    names = resolve_columns(header)
+    keep = [i for i, n in enumerate(names) if n not in PRUNED_COLUMNS]
+
+    dtypes = {}
+    for i in keep:
+        kind = SHEET_SCHEMA.get(names[i])
+        if kind == 'category':
+            dtypes[header[i]] = 'category'
+        elif kind in ('str', 'date'):
+            dtypes[header[i]] = str
+
+    chunks = []
+    reader = pd.read_csv(open_source(), usecols=keep, dtype=dtypes, chunksize=CSV_CHUNK_ROWS)
+    for chunk in reader:
+        chunk.columns = [names[i] for i in keep]
+        if 'DataReferencia' in chunk.columns:
+            chunk['DataReferencia'] = pd.to_datetime(chunk['DataReferencia'], format='%d/%m/%Y', errors='coerce')
+        chunks.append(chunk)
+
+    if not chunks:
+        df = pd.DataFrame(columns=[names[i] for i in keep])
+    elif len(chunks) == 1:
+        df = chunks[0]
+    else:
+        # unir categorias dos blocos sem passar por object
+        cat_cols = [c for c in chunks[0].columns if isinstance(chunks[0][c].dtype, pd.CategoricalDtype)]
+        merged_cats = {c: pd.api.types.union_categoricals([ch[c] for ch in chunks]) for c in cat_cols}
+        df = pd.concat([ch.drop(columns=cat_cols) for ch in chunks], ignore_index=True)
+        for c in cat_cols:
+            df[c] = merged_cats[c]
+        df = df[chunks[0].columns]
+
+    df = apply_schema_dtypes(df)
+    _print_load_summary(df)
+    return df
+
+
+def compute_row_hash(df):
+    """Hash (uint64) de cada linha considerando apenas as colunas vindas da planilha."""
+    data_cols = [c for c in df.columns if c not in DERIVED_COLUMNS]
+    return pd.util.hash_pandas_object(df[data_cols], index=False).to_numpy()
+
+
+def dataset_content_hash(df):
+    """Identificador do conteúdo: sha256 dos nomes das colunas e dos hashes das linhas.
+
+    Mesmo conteúdo (na mesma ordem) gera o mesmo id, qualquer que seja a origem ou o
+    caminho da carga; é ele que chega aos callbacks e chaveia os caches.
+    """
+    row_hash = df['_row_hash'].to_numpy() if '_row_hash' in df.columns else compute_row_hash(df)
+    digest = hashlib.sha256('\x1f'.join(map(str, df.columns)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(row_hash, dtype=np.uint64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _map_text(series, func, normalize=True):
+    """Aplica `func` (vetorizada, sobre o texto normalizado strip+lower, ou o texto exato
+    com normalize=False) a uma coluna.
+    O cálculo é feito só sobre os valores distintos (categorias ou factorize) e expandido
+    pelos códigos; poucas linhas de uma coluna com muitas categorias (ingestão incremental)
+    usam só os valores presentes."""
+    if isinstance(series.dtype, pd.CategoricalDtype) and len(series.cat.categories) <= len(series):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    # última posição = valor para NaN (código -1)
+    values = pd.Series(list(uniques) + [np.nan], dtype=object)
+    text = values.astype(str)
+    mapped = np.asarray(func(text.str.strip().str.lower() if normalize else text))
+    return mapped[codes]
+
+
+def _positivo_code(text):
+    # valores exatos, como nas visões originais ('sim ' ou 'SIM' não contam)
+    return np.select([text == 'Sim', text == 'Não'], [1, 0], -1).astype('int8')
+
+
+def _qualificado_code(text):
+    return np.select([text.str.contains('sim', regex=False), text.str.contains('talvez', regex=False) | text.str.contains('maybe', regex=False)],
+                     [QUALIFICADO_SIM, QUALIFICADO_TALVEZ], QUALIFICADO_NAO).astype('int8')
+
+
+def load_motivo_rules(path):
+    """Lê as regras de motivos: {"regras": [{"motivo": ..., "termos": [...]}, ...]}.
+
+    A primeira regra com algum termo contido no Histórico define o motivo. Arquivo
+    ausente ou inválido: regras padrão (DEFAULT_MOTIVO_RULES).
+    """
+    if not os.path.exists(path):
+        return DEFAULT_MOTIVO_RULES
+    try:
+        with open(path, encoding='utf-8') as f:
+            rules = [(r['motivo'], list(r['termos'])) for r in json.load(f)['regras']]
+        print(f"Regras de motivos carregadas de {path} ({len(rules)} regras)")
+        return rules
+    except Exception as e:
+        print(f"Aviso: regras de motivos inválidas em {path} ({e}); usando as padrão")
+        return DEFAULT_MOTIVO_RULES
+
+
+class MotivoClassifier:
+    """Classifica textos do Histórico em motivos com uma única regex pré-compilada.
+
+    Cada regra vira um lookahead ancorado no início do texto; a alternância testa as
+    regras na ordem, então vence a primeira regra que casar em qualquer posição (mesma
+    prioridade da tabela). Texto vazio = MOTIVO_SEM_RESPOSTA, nenhuma regra = MOTIVO_OUTROS.
+
+    O motivo de cada texto (normalizado) fica guardado entre versões: numa atualização só
+    os textos novos passam pela regex. Acima de `max_known` textos o cache recomeça.
+    """
+
+    max_known = 200000
+
+    def __init__(self, rules):
+        labels = []
+        for motivo, _ in rules:
+            if motivo not in labels:
+                labels.append(motivo)
+        labels += [m for m in (MOTIVO_SEM_RESPOSTA, MOTIVO_OUTROS) if m not in labels]
+        self.dtype = pd.CategoricalDtype(labels)
+        self._outros = labels.index(MOTIVO_OUTROS)
+        branches = [f"(?=.*?(?:{'|'.join(re.escape(t.lower()) for t in termos)}))()" for _, termos in rules if termos]
+        # código do motivo de cada grupo da regex (regras + vazio), na ordem da alternância
+        self._group_codes = np.array([labels.index(m) for m, termos in rules if termos] + [labels.index(MOTIVO_SEM_RESPOSTA)])
+        self.pattern = re.compile('^(?:' + '|'.join(branches + [r'\s*$()']) + ')', re.DOTALL)
+        # texto normalizado -> código do motivo, já classificados
+        self._known = pd.Series([], index=pd.Index([], dtype=object), dtype='int64')
+
+    def _match(self, text):
+        matched = text.str.extract(self.pattern).notna().to_numpy()
+        return np.where(matched.any(axis=1), self._group_codes[matched.argmax(axis=1)], self._outros)
+
+    def _codes(self, text):
+        known = self._known
+        pos = known.index.get_indexer(text)
+        codes = known.to_numpy().take(pos, mode='clip') if len(known) else np.zeros(len(text), dtype='int64')
+        new = pos < 0
+        if new.any():
+            new_text = pd.Index(text[new].unique())
+            new_codes = self._match(pd.Series(new_text, dtype=object))
+            codes[new] = new_codes[new_text.get_indexer(text[new])]
+            if len(known) + len(new_text) > self.max_known:
+                known = known.iloc[:0]
+            self._known = pd.concat([known, pd.Series(new_codes, index=new_text, dtype='int64')])
+        return codes
+
+    def classify(self, series):
+        """Categorical de motivos para uma coluna de Histórico (valores distintos classificados uma vez)."""
+        return pd.Categorical.from_codes(_map_text(series, self._codes), dtype=self.dtype)
+
+
+motivo_classifier = MotivoClassifier(load_motivo_rules(MOTIVOS_FILE))
+
+
+def enrich_rows(df):
+    """Calcula as colunas derivadas (flags normalizadas) das linhas recebidas.
+
+    Chamado uma vez por versão (na ingestão incremental, só para as linhas inseridas e
+    alteradas); trabalha sobre os valores distintos de cada coluna. Colunas ausentes geram
+    flags zeradas.
+    """
+    n = len(df)
+    df['_positivo'] = _map_text(df['Positivo'], _positivo_code, normalize=False) if 'Positivo' in df.columns else np.full(n, -1, dtype='int8')
+    df['_contato_wp'] = _map_text(df['Contato via wp'], lambda t: t == 'sim') if 'Contato via wp' in df.columns else np.zeros(n, dtype=bool)
+    df['_proposta'] = _map_text(df['Proposta'], lambda t: t == 'sim') if 'Proposta' in df.columns else np.zeros(n, dtype=bool)
+    df['_qualificado'] = _map_text(df['Qualificado'], _qualificado_code) if 'Qualificado' in df.columns else np.full(n, QUALIFICADO_NAO, dtype='int8')
+    df['_motivo'] = (motivo_classifier.classify(df['Histórico']) if 'Histórico' in df.columns
+                     else pd.Categorical.from_codes(np.full(n, -1), dtype=motivo_classifier.dtype))
+    return df
+
+
+def ensure_derived_columns(df):
+    """Recalcula as colunas derivadas de um DataFrame carregado do snapshot: as regras de
+    motivos e das flags podem ter mudado desde a gravação (custo baixo, valores distintos)."""
+    if '_row_hash' not in df.columns:
+        df['_row_hash'] = compute_row_hash(df)
+    return enrich_rows(df)
+
+
+def is_sorted_by_reference_date(df):
+    """True se DataReferencia está em ordem crescente com as datas vazias (NaT) no fim."""
+    dates = df['DataReferencia'].to_numpy()
+    valid = ~np.isnat(dates)
+    n_valid = int(valid.sum())
+    if not valid[:n_valid].all():
+        return False
+    head = dates[:n_valid]
+    return bool((head[1:] >= head[:-1]).all())
+
+
+def sort_by_reference_date(df):
+    """Ordena o DataFrame por DataReferencia (estável, NaT no fim), para que os filtros
+    de período virem uma busca binária (ver period_slice). Devolve o mesmo objeto se já
+    estiver ordenado."""
+    if 'DataReferencia' not in df.columns or not pd.api.types.is_datetime64_dtype(df['DataReferencia']):
+        return df
+    if is_sorted_by_reference_date(df):
+        return df
+    return df.sort_values('DataReferencia', kind='stable', na_position='last').reset_index(drop=True)
+
+
+def _snapshot_path(fmt):
+    return os.path.join(CACHE_DIR, f'resumo.{fmt}')
+
+
+def save_snapshot(df, meta):
+    """Grava o DataFrame normalizado e os metadados da coleta de forma atômica (tmp + replace)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fmt = SNAPSHOT_FORMAT
+    path = _snapshot_path(fmt)
+    tmp = path + '.tmp'
+    try:
+        if fmt == 'parquet':
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+    except Exception as e:
+        # colunas com tipos mistos podem não ser aceitas pelo Parquet; cair para pickle
+        print(f"Aviso: falha ao gravar snapshot em {fmt} ({e}); usando pickle")
+        fmt = 'pickle'
+        path = _snapshot_path(fmt)
+        tmp = path + '.tmp'
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+    meta = dict(meta, format=fmt, rows=int(len(df)), saved_at=datetime.now().isoformat(timespec='seconds'))
+    tmp_meta = SNAPSHOT_META_FILE + '.tmp'
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_meta, SNAPSHOT_META_FILE)
+    return meta
+
+
+def load_snapshot():
+    """Carrega o último snapshot gravado. Retorna (df, meta) ou (None, {}) se não houver."""
+    try:
+        with open(SNAPSHOT_META_FILE, encoding='utf-8') as f:
+            meta = json.load(f)
+        path = _snapshot_path(meta.get('format', 'pickle'))
+        if meta.get('format') == 'parquet':
+            snap_df = pd.read_parquet(path)
+        else:
+            snap_df = pd.read_pickle(path)
+        return snap_df, meta
+    except FileNotFoundError:
+        return None, {}
+    except Exception as e:
+        print(f"Aviso: snapshot local ignorado ({e})")
+        return None, {}
+
+
+def fetch_sheet_csv(url, meta=None, timeout=None):
+    """Baixa o export CSV usando requisição condicional (ETag / Last-Modified).
+
+    Retorna (conteudo_bytes, headers); conteudo é None quando o servidor responde 304.
+    """
+    meta = meta or {}
+    req = urllib.request.Request(url)
+    if meta.get('etag'):
+        req.add_header('If-None-Match', meta['etag'])
+    if meta.get('last_modified'):
+        req.add_header('If-Modified-Since', meta['last_modified'])
+    try:
+        with urllib.request.urlopen(req, timeout=timeout or FETCH_TIMEOUT) as resp:
+            content = resp.read()
+            headers = {'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified')}
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, {'etag': meta.get('etag'), 'last_modified': meta.get('last_modified')}
+        raise
+    return content, headers
+
+
+def _file_signature(*paths):
+    """Assinatura barata (tamanho + mtime) usada para detectar arquivos sem alteração."""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f'{st.st_size}:{st.st_mtime_ns}')
+        except FileNotFoundError:
+            parts.append('-')
+    return '|'.join(parts)
+
+
+class DataSource:
+    """Origem dos dados da aba Resumo.
+
+    `fetch(meta)` recebe os metadados da última coleta e retorna (df, meta). df é None
+    quando a origem informa que nada mudou; nesse caso o snapshot atual é mantido.
+    """
+
+    def describe(self):
+        raise NotImplementedError
+
+    def fetch(self, meta):
+        raise NotImplementedError
+
+
+class GoogleSheetsSource(DataSource):
+    """Export CSV do Google Sheets (sem API nem credenciais), com requisição condicional."""
+
+    def __init__(self, url, timeout=None):
+        self.url = url
+        self.timeout = timeout
+
+    def describe(self):
+        return self.url
+
+    def fetch(self, meta):
+        content, headers = fetch_sheet_csv(self.url, meta, timeout=self.timeout)
+        if content is None:
+            print("Planilha sem alterações (HTTP 304); mantendo snapshot")
+            return None, meta
+        content_hash = hashlib.sha256(content).hexdigest()
+        if meta.get('content_hash') == content_hash:
+            print("Planilha sem alterações (mesmo hash); mantendo snapshot")
+            return None, meta
+        return read_sheet_csv(content), dict(headers, content_hash=content_hash)
+
+
+class LocalFileSource(DataSource):
+    """Arquivo local no formato do export (CSV) ou um Parquet já normalizado."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def describe(self):
+        return f'file:{os.path.abspath(self.path)}'
+
+    def fetch(self, meta):
+        signature = _file_signature(self.path)
+        if meta.get('file_signature') == signature:
+            return None, meta
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+        if meta.get('content_hash') == content_hash:
+            return None, dict(meta, file_signature=signature)
+        if self.path.lower().endswith('.parquet'):
+            df = normalize_sheet_dataframe(pd.read_parquet(io.BytesIO(content)))
+        else:
+            df = read_sheet_csv(content)
+        return df, {'content_hash': content_hash, 'file_signature': signature}
+
+
+class SQLiteSource(DataSource):
+    """Tabela SQLite com as mesmas colunas da aba Resumo."""
+
+    def __init__(self, path, table):
+        self.path = path
+        self.table = table
+
+    def describe(self):
+        return f'sqlite:{os.path.abspath(self.path)}#{self.table}'
+
+    def fetch(self, meta):
+        signature = _file_signature(self.path, self.path + '-wal')
+        if meta.get('file_signature') == signature:
+            return None, meta
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+        with contextlib.closing(sqlite3.connect(self.path)) as conn:
+            df = pd.read_sql_query(f'SELECT * FROM "{self.table}"', conn)
+        df = normalize_sheet_dataframe(df)
+        content_hash = hashlib.sha256(compute_row_hash(df).tobytes()).hexdigest()
+        if meta.get('content_hash') == content_hash:
+            return None, dict(meta, file_signature=signature)
+        return df, {'content_hash': content_hash, 'file_signature': signature}
+
+
+class MultiSheetSource(DataSource):
+    """Várias abas/arquivos buscados em paralelo e concatenados em um único dataset.
+
+    Cada parte roda em um pool limitado (FETCH_WORKERS) com tempo máximo SOURCE_TIMEOUT.
+    Uma parte lenta ou com erro não trava a atualização: os últimos dados lidos dela são
+    reaproveitados. Só há erro se uma parte nunca foi lida com sucesso.
+    """
+
+    def __init__(self, parts, max_workers=FETCH_WORKERS, timeout=SOURCE_TIMEOUT):
+        self.parts = parts  # lista de (nome, DataSource)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._frames = {}
+
+    def describe(self):
+        return 'multi:' + ';'.join(f'{name}={src.describe()}' for name, src in self.parts)
+
+    def _fetch_parts(self, parts, metas):
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(parts))))
+        try:
+            futures = {pool.submit(src.fetch, metas.get(name, {})): name for name, src in parts}
+            done, not_done = concurrent.futures.wait(futures, timeout=self.timeout)
+            results = {}
+            for fut in done:
+                name = futures[fut]
+                try:
+                    results[name] = fut.result()
+                except Exception as e:
+                    print(f"Aviso: falha ao ler a aba {name}: {e}")
+            for fut in not_done:
+                print(f"Aviso: aba {futures[fut]} excedeu {self.timeout:.0f}s; mantendo os últimos dados dela")
+            return results
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def fetch(self, meta):
+        part_metas = dict(meta.get('parts', {}))
+        results = self._fetch_parts(self.parts, part_metas)
+        if all(name in results and results[name][0] is None for name, _ in self.parts):
+            return None, meta
+
+        # partes sem alteração cujo frame não está em memória (ex.: após reiniciar) são relidas por completo
+        missing = [(name, src) for name, src in self.parts
+                   if name not in self._frames and (name not in results or results[name][0] is None)]
+        if missing:
+            results.update(self._fetch_parts(missing, {}))
+
+        frames = []
+        for name, _ in self.parts:
+            part_df, part_meta = results.get(name, (None, None))
+            if part_df is not None:
+                if 'Nomeaba' not in part_df.columns:
+                    part_df['Nomeaba'] = name
+                self._frames[name] = part_df
+                part_metas[name] = part_meta
+            if name not in self._frames:
+                raise RuntimeError(f'aba {name} indisponível e sem dados anteriores')
+            frames.append(self._frames[name])
+
+        df = apply_schema_dtypes(pd.concat(frames, ignore_index=True))
+        content_hash = hashlib.sha256(''.join(part_metas[name].get('content_hash', '') for name, _ in self.parts).encode()).hexdigest()
+        return df, {'content_hash': content_hash, 'parts': part_metas}
+
+
+def _sheet_gid_parts():
+    parts = []
+    for item in (p.strip() for p in SHEET_GIDS.split(',')):
+        if not item:
+            continue
+        name, _, gid = item.rpartition('=')
+        base = SHEET_CSV_URL.split('&gid=')[0]
+        parts.append((name or f'gid{gid}', GoogleSheetsSource(f'{base}&gid={gid}', timeout=SOURCE_TIMEOUT)))
+    return parts
+
+
+def create_data_source(kind=None, path=None):
+    """Cria a origem de dados configurada (LEADS_SOURCE / LEADS_SOURCE_PATH / LEADS_SHEET_GIDS)."""
+    kind = (kind or DATA_SOURCE).strip().lower()
+    path = path or DATA_SOURCE_PATH
+    if kind == 'google':
+        parts = _sheet_gid_parts()
+        if parts:
+            return MultiSheetSource(parts)
+        return GoogleSheetsSource(SHEET_CSV_URL)
+    if kind == 'file':
+        if not path:
+            raise ValueError('LEADS_SOURCE=file exige LEADS_SOURCE_PATH')
+        paths = [p for p in path.split(os.pathsep) if p]
+        if len(paths) > 1:
+            return MultiSheetSource([(os.path.splitext(os.path.basename(p))[0], LocalFileSource(p)) for p in paths])
+        return LocalFileSource(path)
+    if kind == 'sqlite':
+        if not path:
+            raise ValueError('LEADS_SOURCE=sqlite exige LEADS_SOURCE_PATH')
+        return SQLiteSource(path, SQLITE_TABLE)
+    raise ValueError(f'Origem de dados desconhecida: {kind!r} (use google, file ou sqlite)')
+
+
+data_source = create_data_source()
+
+
+def apply_incremental_changes(prev_df, df):
+    """Preenche as colunas derivadas de `df` (novo export, já com _row_hash) reaproveitando
+    as do snapshot anterior nas linhas inalteradas; só inseridas/alteradas (numregistro
+    novo ou hash diferente) passam por enrich_rows.
+
+    Devolve None quando não há como casar as linhas (numregistro ausente, vazio ou
+    duplicado, colunas diferentes): o chamador enriquece o frame inteiro.
+    """
+    if 'numregistro' not in df.columns or 'numregistro' not in prev_df.columns:
+        return None
+    if any(c not in prev_df.columns for c in DERIVED_COLUMNS):
+        return None
+    if [c for c in prev_df.columns if c not in DERIVED_COLUMNS] != [c for c in df.columns if c not in DERIVED_COLUMNS]:
+        print("Ingestão incremental: colunas mudaram; recalculando todas as linhas")
+        return None
+    new_keys = pd.Index(df['numregistro'])
+    prev_keys = pd.Index(prev_df['numregistro'])
+    if new_keys.hasnans or not new_keys.is_unique or not prev_keys.is_unique:
+        print("Ingestão incremental: numregistro vazio ou duplicado; recalculando todas as linhas")
+        return None
+
+    # posição de cada linha nova no snapshot anterior (-1 = inserida)
+    source = prev_keys.get_indexer(new_keys)
+    found = source >= 0
+    same = found.copy()
+    same[found] = prev_df['_row_hash'].to_numpy()[source[found]] == df['_row_hash'].to_numpy()[found]
+    changed = np.flatnonzero(~same)
+    print(f"Ingestão incremental: {int((~found).sum())} inserções, {len(changed) - int((~found).sum())} alterações, "
+          f"{len(prev_keys) - int(found.sum())} exclusões")
+
+    enriched = enrich_rows(df.iloc[changed].copy())
+    if any(prev_df[col].dtype != enriched[col].dtype for col in DERIVED_COLUMNS[1:]):
+        return None
+    source[changed] = 0
+    for col in DERIVED_COLUMNS[1:]:
+        prev_col, new_col = prev_df[col], enriched[col]
+        if isinstance(prev_col.dtype, pd.CategoricalDtype):
+            codes = prev_col.cat.codes.to_numpy().take(source)
+            codes[changed] = new_col.cat.codes.to_numpy()
+            df[col] = pd.Categorical.from_codes(codes, dtype=prev_col.dtype)
+        else:
+            values = prev_col.to_numpy().take(source)
+            values[changed] = new_col.to_numpy()
+            df[col] = values
+    return df
+
+
+def get_leads_data(use_snapshot=False):
+    """
+    Busca os dados da aba 'Resumo' na origem configurada (por padrão o export CSV
+    do Google Sheets, sem necessidade de API ou credenciais).
+
+    Com use_snapshot=True devolve o snapshot local (se existir) sem acessar a origem.
+    Quando a origem não mudou (304, mesmo hash ou mesmo arquivo), o parse é pulado e o
+    DataFrame do snapshot é reaproveitado.
+    """
+    if _snapshot['df'] is None:
+        snap_df, snap_meta = load_snapshot()
+        if snap_df is not None and snap_meta.get('source') == data_source.describe():
+            _snapshot.update(df=sort_by_reference_date(ensure_derived_columns(snap_df)), meta=snap_meta)
+    if use_snapshot and _snapshot['df'] is not None:
+        print(f"Dados carregados do snapshot local ({_snapshot['meta'].get('saved_at')})")
+        return _snapshot['df']
+
+    prev_meta = _snapshot['meta'] if _snapshot['df'] is not None else {}
+    df, meta = data_source.fetch(prev_meta)
+    if df is None:
+        if meta is not prev_meta:
+            _snapshot['meta'] = meta
+        return _snapshot['df']
+
+    df['_row_hash'] = compute_row_hash(df)
+    merged = None
+    if INCREMENTAL_INGEST and _snapshot['df'] is not None:
+        merged = apply_incremental_changes(_snapshot['df'], df)
+    df = sort_by_reference_date(merged if merged is not None else enrich_rows(df))
+
+    meta = dict(meta, source=data_source.describe())
+    try:
+        meta = save_snapshot(df, meta)
+    except Exception as e:
+        print(f"Aviso: não foi possível gravar o snapshot local ({e})")
+    _snapshot.update(df=df, meta=meta)
+
     return df
 
 
+class DailyCube:
+    """Contagens por (dia, consultora, métrica) com somas acumuladas ao longo dos dias.
+
+    Montado uma vez por versão: o total de qualquer período sai da diferença entre duas
+    linhas do acumulado (busca binária nos dias), sem percorrer os leads. As consultoras
+    seguem as categorias da coluna; a última posição guarda os registros sem consultora
+    (vazio), e `blank` marca as categorias só com espaços, que também contam como
+    "sem consultora". Registros sem DataReferencia ficam de fora, como no filtro de período.
+    """
+
+    __slots__ = ('days', 'consultoras', 'blank', 'counts', 'cumulative')
+
+    def __init__(self, df):
+        n_metrics = len(CUBE_METRICS)
+        if 'DataReferencia' in df.columns and pd.api.types.is_datetime64_dtype(df['DataReferencia']):
+            dates = df['DataReferencia'].to_numpy()
+            valid = ~np.isnat(dates)
+            self.days, day_idx = np.unique(dates[valid].astype('datetime64[D]'), return_inverse=True)
+        else:
+            valid = np.zeros(len(df), dtype=bool)
+            self.days, day_idx = np.array([], dtype='datetime64[D]'), np.array([], dtype=np.intp)
+
+        if 'Consultora' in df.columns:
+            col = df['Consultora']
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                codes, names = col.cat.codes.to_numpy(), col.cat.categories
+            else:
+                codes, names = pd.factorize(col)
+            self.consultoras = [str(c) if not isinstance(c, str) else c for c in names]
+            self.blank = np.array([str(c).strip() == '' for c in names] + [True])
+            cons_idx = np.where(codes < 0, len(names), codes)[valid]
+        else:
+            self.consultoras = None
+            self.blank = np.array([True])
+            cons_idx = np.zeros(int(valid.sum()), dtype=np.intp)
+        n_days, n_slots = len(self.days), len(self.blank)
+
+        flags = np.zeros((int(valid.sum()), n_metrics), dtype=np.int64)
+        flags[:, M_TOTAL] = 1
+        if 'Positivo' in df.columns:
+            positivo = df['_positivo'].to_numpy()[valid]
+            flags[:, M_POSITIVOS] = positivo == 1
+            flags[:, M_NEGATIVOS] = positivo == 0
+        if 'Contato via wp' in df.columns:
+            flags[:, M_CONTATO_WP] = df['_contato_wp'].to_numpy()[valid]
+        if 'Proposta' in df.columns:
+            flags[:, M_PROPOSTA] = df['_proposta'].to_numpy()[valid]
+        qualificado = df['_qualificado'].to_numpy()[valid]
+        for code in QUALIFICADO_LABELS:
+            flags[:, M_QUALIFICADO + code] = qualificado == code
+        if 'Empresa' in df.columns:
+            flags[:, M_COM_EMPRESA] = df['Empresa'].notna().to_numpy()[valid]
+
+        key = day_idx * n_slots + cons_idx
+        self.counts = np.stack([np.bincount(key, weights=flags[:, m], minlength=n_days * n_slots)
+                                for m in range(n_metrics)], axis=-1).astype(np.int64).reshape(n_days, n_slots, n_metrics)
+        self.cumulative = np.zeros((n_days + 1, n_slots, n_metrics), dtype=np.int64)
+        np.cumsum(self.counts, axis=0, out=self.cumulative[1:])
+
+    @classmethod
+    def from_arrays(cls, days, consultoras, blank, counts, cumulative):
+        """Cubo já calculado (ex.: arrays mapeados do SharedStore), sem recontar os leads."""
+        cube = cls.__new__(cls)
+        cube.days, cube.consultoras, cube.blank = days, consultoras, blank
+        cube.counts, cube.cumulative = counts, cumulative
+        return cube
+
+    def _bounds(self, start, end):
+        lo = self.days.searchsorted(np.datetime64(pd.Timestamp(start).date(), 'D'), side='left')
+        hi = self.days.searchsorted(np.datetime64(pd.Timestamp(end).date(), 'D'), side='right')
+        return lo, max(lo, hi)
+
+    def totals(self, start, end):
+        """Matriz (consultora, métrica) com as somas do período start..end (inclusive)."""
+        lo, hi = self._bounds(start, end)
+        return self.cumulative[hi] - self.cumulative[lo]
+
+    def daily(self, start, end):
+        """Dias do período com registros e a matriz (consultora, métrica) de cada um."""
+        lo, hi = self._bounds(start, end)
+        return self.days[lo:hi], self.counts[lo:hi]
+
+    def by_consultora(self, totals, metric):
+        """Série consultora -> contagem (sem zeros, decrescente), como count_by."""
+        if self.consultoras is None:
+            return pd.Series(dtype='int64')
+        values = totals[:-1, metric]
+        order = [i for i in np.argsort(-values, kind='stable') if values[i] > 0]
+        return pd.Series(values[order], index=[self.consultoras[i] for i in order], dtype='int64')
+
+
+class TimeSeriesRollups:
+    """Totais diários (somando as consultoras do cubo) e, para cada dia, a semana
+    (segunda-feira) e o mês a que pertence. Montado uma vez por versão; um período vira
+    uma fatia dos dias somada por semana ou mês (np.add.reduceat), exata nas bordas.
+    """
+
+    __slots__ = ('days', 'daily', 'buckets')
+
+    def __init__(self, cube):
+        self.days = cube.days
+        self.daily = cube.counts.sum(axis=1)
+        day_numbers = self.days.astype('int64')
+        # 1970-01-01 foi quinta-feira: (dia + 3) % 7 = dia da semana com segunda = 0
+        weeks = self.days - ((day_numbers + 3) % 7).astype('timedelta64[D]')
+        months = self.days.astype('datetime64[M]').astype('datetime64[D]')
+        self.buckets = {'D': self.days, 'W': weeks, 'M': months}
+
+    @staticmethod
+    def resolution(start, end):
+        span = (pd.Timestamp(end) - pd.Timestamp(start)).days
+        if span <= SERIES_DAILY_MAX_DAYS:
+            return 'D'
+        return 'W' if span <= SERIES_WEEKLY_MAX_DAYS else 'M'
+
+    def series(self, start, end, resolution):
+        """(datas dos pontos, matriz ponto x métrica) do período na resolução pedida."""
+        lo = self.days.searchsorted(np.datetime64(pd.Timestamp(start).date(), 'D'), side='left')
+        hi = self.days.searchsorted(np.datetime64(pd.Timestamp(end).date(), 'D'), side='right')
+        if hi <= lo:
+            return self.days[:0], self.daily[:0]
+        keys = self.buckets[resolution][lo:hi]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return keys[starts], np.add.reduceat(self.daily[lo:hi], starts, axis=0)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: índices de n_out pontos que preservam a forma da linha.
+
+    Mantém o primeiro e o último ponto; em cada balde intermediário escolhe o ponto que forma
+    o maior triângulo com o ponto já escolhido e a média do balde seguinte.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    chosen = np.empty(n_out, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(area.argmax())
+        chosen[i + 1] = a
+    return chosen
+
+
+class OverdueIndex:
+    """Leads positivos com DataReferencia, na ordem das datas, e os dias em atraso de cada
+    um em relação a `today`.
+
+    Como as datas estão ordenadas, "atraso >= N dias" (data <= today - N) é sempre um
+    prefixo: qualquer N vira uma busca binária. Vale para uma versão do Dataset e um dia
+    do calendário (ver current_overdue). Ordenações e valores de colunas usados pela
+    tabela paginada são calculados na primeira consulta e guardados no próprio índice.
+    """
+
+    __slots__ = ('today', 'rows', 'days', 'dias_atraso', 'cons_codes', 'consultoras', 'orders', 'values')
+
+    def __init__(self, df, today):
+        self.today = np.datetime64(today, 'D')
+        if ('Positivo' in df.columns and 'DataReferencia' in df.columns
+                and pd.api.types.is_datetime64_dtype(df['DataReferencia'])):
+            dates = df['DataReferencia'].to_numpy()
+            # o Dataset publicado já está ordenado por DataReferencia (sort_by_reference_date)
+            self.rows = np.flatnonzero((df['_positivo'].to_numpy() == 1) & ~np.isnat(dates))
+            self.days = dates[self.rows].astype('datetime64[D]')
+        else:
+            self.rows = np.array([], dtype=np.intp)
+            self.days = np.array([], dtype='datetime64[D]')
+        self.dias_atraso = (self.today - self.days).astype('int64')
+
+        if 'Consultora' in df.columns:
+            col = df['Consultora']
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                codes, names = col.cat.codes.to_numpy(), col.cat.categories
+            else:
+                codes, names = pd.factorize(col)
+            self.cons_codes = np.asarray(codes)[self.rows]
+            self.consultoras = list(names)
+        else:
+            self.cons_codes = None
+            self.consultoras = None
+        self.orders = {}
+        self.values = {}
+
+    def _bounds(self, min_days, start=None, end=None):
+        cutoff = self.today - np.timedelta64(int(np.ceil(min_days)), 'D')
+        hi = self.days.searchsorted(cutoff, side='right')
+        lo = 0
+        if start is not None:
+            lo = self.days.searchsorted(np.datetime64(pd.Timestamp(start).date(), 'D'), side='left')
+        if end is not None:
+            hi = min(hi, self.days.searchsorted(np.datetime64(pd.Timestamp(end).date(), 'D'), side='right'))
+        return lo, max(lo, hi)
+
+    def count(self, min_days, start=None, end=None):
+        """Quantidade de positivos com atraso >= min_days (opcionalmente só do período)."""
+        lo, hi = self._bounds(min_days, start, end)
+        return int(hi - lo)
+
+    def counts(self, min_days, start=None, end=None):
+        """Atrasados por consultora, na ordem de `consultoras` (None sem a coluna)."""
+        if self.consultoras is None:
+            return None
+        lo, hi = self._bounds(min_days, start, end)
+        codes = self.cons_codes[lo:hi]
+        return np.bincount(codes[codes >= 0], minlength=len(self.consultoras))
+
+    def by_consultora(self, min_days, start=None, end=None):
+        """Série consultora -> atrasados (sem zeros, decrescente), como count_by."""
+        if self.consultoras is None:
+            return pd.Series(dtype='int64')
+        counts = self.counts(min_days, start, end)
+        order = [i for i in np.argsort(-counts, kind='stable') if counts[i] > 0]
+        return pd.Series(counts[order], index=[self.consultoras[i] for i in order], dtype='int64')
+
+    def frame(self, df, min_days):
+        """Linhas em atraso com a coluna DiasAtraso, do maior para o menor atraso."""
+        lo, hi = self._bounds(min_days)
+        out = df.take(self.rows[lo:hi])
+        out['DiasAtraso'] = self.dias_atraso[lo:hi]
+        return out
+
+    def column(self, df, name):
+        """Valores da coluna para todos os positivos do índice (DiasAtraso incluída)."""
+        values = self.values.get(name)
+        if values is None:
+            if name == 'DiasAtraso':
+                values = pd.Series(self.dias_atraso)
+            else:
+                values = pd.Series(df[name].to_numpy()[self.rows]).astype(object)
+            self.values[name] = values
+        return values
+
+    def order(self, df, name, descending):
+        """Posições do índice ordenadas pela coluna (estável: empates mantêm o maior atraso
+        primeiro). Como "atraso >= N" é o prefixo [0, hi), a ordem de qualquer N é esta
+        mesma permutação restrita às posições < hi."""
+        key = (name, descending)
+        order = self.orders.get(key)
+        if order is None:
+            if name == 'DiasAtraso' and descending:
+                order = np.arange(len(self.rows))
+            else:
+                order = self.column(df, name).sort_values(
+                    ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+            self.orders[key] = order
+        return order
+
+
+
+# Cores dos cards por consultora: mapeamento explícito nome -> cor (edite conforme sua
+# preferência) e paleta pastel para os demais nomes, escolhida pelo md5 do nome
+CONSULTORA_PALETTE = ['#FDEBD0', '#E8F8F5', '#F6EBF6', '#FEF9E7', '#E8F6FF', '#FFF0F5', '#FBEFF2', '#EAF8F1']
+CONSULTORA_COLOR_MAP = {
+    'Lidiane': '#DCEEFF',   # azul claro
+    'Lidiane ': '#DCEEFF',  # possível variação com espaço
+    'Jéssica': '#F6E8F6',   # rosa / lilás claro
+    'Jessica': '#F6E8F6',   # sem acento
+    # adicione outros nomes conhecidos aqui
+}
+
+
+def consultora_color(name):
+    """Cor do card da consultora, com fallback determinístico baseado em hash."""
+    try:
+        if not name:
+            return CONSULTORA_PALETTE[0]
+        key = str(name).strip()
+        if key in CONSULTORA_COLOR_MAP:
+            return CONSULTORA_COLOR_MAP[key]
+        idx = int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % len(CONSULTORA_PALETTE)
+        return CONSULTORA_PALETTE[idx]
+    except Exception:
+        return CONSULTORA_PALETTE[0]
+
+
+class Dataset:
+    """Versão publicada dos dados. Nunca é alterada depois de publicada: uma atualização
+    gera um novo Dataset, trocado por uma única atribuição de referência."""
+
+    __slots__ = ('df', 'version', 'content_hash', 'loaded_at', 'schema', 'cube', 'rollups', 'colors')
+
+    def __init__(self, df, version, loaded_at, content_hash=None, cube=None):
+        self.df = df
+        # número sequencial (exibição) e hash do conteúdo (identidade dos dados)
+        self.version = version
+        self.content_hash = content_hash or dataset_content_hash(df)
+        self.loaded_at = loaded_at
+        # campo lógico -> coluna, resolvido uma vez por versão (callbacks só consultam)
+        self.schema = build_schema(df.columns)
+        # agregados diários da aba Análise Geral (cards e pizza)
+        self.cube = cube if cube is not None else DailyCube(df)
+        # série temporal diária/semanal/mensal
+        self.rollups = TimeSeriesRollups(self.cube)
+        # cor do card de cada consultora do cubo (mesma ordem de cube.consultoras)
+        self.colors = [consultora_color(c) for c in self.cube.consultoras or []]
+
+
+_dataset = None
+_publish_lock = threading.Lock()
+
+
+def current_dataset():
+    """Retorna o Dataset vigente. Callbacks devem ler a referência uma única vez por chamada."""
+    return _dataset
+
+
+# ((versão, dia), OverdueIndex) — trocado por uma única atribuição, como o Dataset
+_overdue = (None, None)
+
+
+def current_overdue(ds):
+    """OverdueIndex do Dataset informado, refeito só quando muda a versão ou o dia."""
+    global _overdue
+    key = (ds.content_hash, datetime.now().date())
+    cached_key, index = _overdue
+    if cached_key != key:
+        index = OverdueIndex(ds.df, key[1])
+        _overdue = (key, index)
+    return index
+
+
+class ResultCache:
+    """Cache LRU dos resultados dos callbacks, compartilhado entre usuários.
+
+    A chave começa pelo hash do conteúdo do Dataset; `invalidate(version)` descarta tudo
+    na troca de versão e recusa resultados calculados sobre a versão anterior que terminem depois
+    da troca. Contadores de acerto/erro em `stats()`.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        # cálculo fora do lock: outras chaves continuam sendo atendidas
+        value = compute()
+        with self._lock:
+            if key[0] == self.version and self.max_entries > 0:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, version):
+        with self._lock:
+            self.version = version
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'version': self.version, 'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / total, 3) if total else None}
+
+
+result_cache = ResultCache(RESULT_CACHE_SIZE)
+
+
+def _cache_key_part(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return value
+
+
+def cached_view(view):
+    """Memoiza um callback em result_cache por (versão, dia, visão, entradas).
+
+    data_version (hash dos dados vindo do navegador) só dispara a atualização e fica fora
+    da chave, que já usa o Dataset vigente; o dia entra porque atrasos dependem da data
+    corrente.
+    """
+    def decorator(func):
+        params = list(inspect.signature(func).parameters)
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            parts = tuple(_cache_key_part(v) for name, v in zip(params, args) if name != 'data_version')
+            key = (current_dataset().content_hash, datetime.now().date(), view) + parts
+            return result_cache.get_or_compute(key, lambda: func(*args))
+        return wrapper
+    return decorator
+
+
+def publish_dataset(new_df, content_hash=None, cube=None):
+    """Publica um novo DataFrame como versão corrente (troca atômica de referência).
+
+    Conteúdo igual ao da versão vigente (mesmo hash) não gera nova versão: callbacks e
+    caches continuam valendo. `content_hash` e `cube` já calculados (SharedStore) são
+    reaproveitados.
+    """
+    global _dataset
+    new_df = sort_by_reference_date(new_df)
+    content_hash = content_hash or dataset_content_hash(new_df)
+    with _publish_lock:
+        if _dataset is not None and _dataset.content_hash == content_hash:
+            print(f"Dados sem alterações (hash {content_hash}); mantendo versão {_dataset.version}")
+            return _dataset
+        version = _dataset.version + 1 if _dataset is not None else 1
+        _dataset = Dataset(new_df, version, datetime.now(), content_hash, cube)
+        result_cache.invalidate(content_hash)
+    print(f"Dataset versão {version} publicado ({len(new_df)} registros)")
+    report_schema(_dataset)
+    return _dataset
+
+
+def report_schema(ds):
+    """Informa (uma vez por versão) campos esperados ausentes e colunas não reconhecidas."""
+    missing = [f for f, col in ds.schema.items() if col is None and FIELD_ALIASES[f][0] not in PRUNED_COLUMNS]
+    known = set(ds.schema.values()) | set(DERIVED_COLUMNS)
+    unknown = [c for c in ds.df.columns if c not in known]
+    if missing:
+        print(f"Aviso: campos ausentes na planilha: {', '.join(FIELD_ALIASES[f][0] for f in missing)}")
+    if unknown:
+        print(f"Aviso: colunas não reconhecidas: {', '.join(map(str, unknown))}")
+
+
+class SharedStore:
+    """Versões publicadas em disco, para vários processos servirem os mesmos dados.
+
+    Cada versão fica em SHARED_DIR/<hash>/: uma .npy por coluna (categorias e texto como
+    códigos + dicionário de valores distintos) e os arrays do DailyCube. Os processos
+    abrem os arquivos com np.load(mmap_mode='r'), então as páginas são do cache do
+    sistema e compartilhadas entre eles; só o texto é remontado em cada processo a partir
+    do dicionário. O arquivo CURRENT (gravado por último, com troca atômica) aponta a
+    versão vigente. Os dados mapeados são somente leitura, como todo Dataset publicado.
+    """
+
+    CUBE_ARRAYS = ('days', 'blank', 'counts', 'cumulative')
+
+    def __init__(self, root):
+        self.root = root
+        self.pointer = os.path.join(root, 'CURRENT')
+
+    def current(self):
+        """Nome da versão apontada por CURRENT (None se ainda não houver)."""
+        try:
+            with open(self.pointer, encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def content_hash(name):
+        """Hash do conteúdo de uma versão (o nome da pasta, com `.<pid>` se houve conflito)."""
+        return name.split('.', 1)[0] if name else None
+
+    def complete(self, name):
+        """True se a versão tem o manifest e todos os arquivos listados nele (uma pasta de
+        onde o rmtree não conseguiu apagar tudo não deve ser reaproveitada)."""
+        path = os.path.join(self.root, name)
+        try:
+            with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+                files = json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            return False
+        return all(os.path.isfile(os.path.join(path, file)) for file in files)
+
+    def write(self, ds, keep=2):
+        """Grava a versão `ds` (se ainda não existir completa), aponta CURRENT para ela e
+        remove as antigas, mantendo as `keep` mais recentes (processos podem ainda ler a anterior).
+
+        A versão é gravada numa pasta temporária renomeada no fim, com o manifest por
+        último. Se sobrou uma pasta incompleta com o mesmo hash que não pode ser apagada
+        (arquivos ainda mapeados no Windows), a versão vai para `<hash>.<pid>` ao lado.
+        """
+        name = ds.content_hash
+        path = os.path.join(self.root, name)
+        if not self.complete(name):
+            shutil.rmtree(path, ignore_errors=True)
+            if os.path.exists(path):
+                name = f'{ds.content_hash}.{os.getpid()}'
+                path = os.path.join(self.root, name)
+                shutil.rmtree(path, ignore_errors=True)
+            tmp = f'{path}.tmp{os.getpid()}'
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            manifest = {'content_hash': ds.content_hash, 'rows': int(len(ds.df)), 'columns': [],
+                        'index': None if isinstance(ds.df.index, pd.RangeIndex) and ds.df.index.start == 0
+                        and ds.df.index.step == 1 else 'index.pkl',
+                        'consultoras': ds.cube.consultoras}
+            for i, column in enumerate(ds.df.columns):
+                manifest['columns'].append(self._write_column(tmp, f'c{i:03d}', column, ds.df[column]))
+            if manifest['index']:
+                ds.df.index.to_series().to_pickle(os.path.join(tmp, manifest['index']))
+            for attr in self.CUBE_ARRAYS:
+                np.save(os.path.join(tmp, f'cube.{attr}.npy'), getattr(ds.cube, attr))
+            manifest['files'] = sorted(os.listdir(tmp))
+            with open(os.path.join(tmp, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        tmp_pointer = f'{self.pointer}.tmp{os.getpid()}'
+        with open(tmp_pointer, 'w', encoding='utf-8') as f:
+            f.write(name)
+        os.replace(tmp_pointer, self.pointer)
+        versions = sorted((e for e in os.scandir(self.root) if e.is_dir() and e.path != path),
+                          key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in versions[keep - 1:]:
+            # no Windows arquivos ainda mapeados não podem ser apagados; ficam para a próxima
+            shutil.rmtree(entry.path, ignore_errors=True)
+        return name
+
+    @staticmethod
+    def _write_column(path, key, name, col):
+        spec = {'name': name, 'file': key}
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            spec.update(kind='category', ordered=bool(col.dtype.ordered))
+            np.save(os.path.join(path, f'{key}.npy'), col.cat.codes.to_numpy())
+            np.save(os.path.join(path, f'{key}.dict.npy'), col.cat.categories.to_numpy(dtype=object), allow_pickle=True)
+        elif col.dtype == object:
+            codes, uniques = pd.factorize(col)
+            spec.update(kind='text')
+            np.save(os.path.join(path, f'{key}.npy'), codes)
+            np.save(os.path.join(path, f'{key}.dict.npy'), np.asarray(uniques, dtype=object), allow_pickle=True)
+        elif isinstance(col.dtype, np.dtype):
+            spec.update(kind='array')
+            np.save(os.path.join(path, f'{key}.npy'), col.to_numpy())
+        else:
+            # tipos de extensão do pandas: sem mapeamento, cópia em cada processo
+            spec.update(kind='pickle')
+            col.to_pickle(os.path.join(path, f'{key}.pkl'))
+        return spec
+
+    def open(self, name):
+        """(df, cube) da versão gravada, com os arrays mapeados somente leitura."""
+        path = os.path.join(self.root, name)
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        columns = {}
+        for spec in manifest['columns']:
+            file = os.path.join(path, spec['file'])
+            if spec['kind'] == 'pickle':
+                columns[spec['name']] = pd.read_pickle(file + '.pkl')
+                continue
+            values = np.load(file + '.npy', mmap_mode='r')
+            if spec['kind'] == 'category':
+                dtype = pd.CategoricalDtype(np.load(file + '.dict.npy', allow_pickle=True), spec['ordered'])
+                values = pd.Categorical.from_codes(values, dtype=dtype)
+            elif spec['kind'] == 'text':
+                uniques = np.load(file + '.dict.npy', allow_pickle=True)
+                # ausentes voltam como NaN, como na leitura da planilha
+                text = np.full(len(values), np.nan, dtype=object)
+                present = values >= 0
+                text[present] = uniques[values[present]]
+                values = text
+            columns[spec['name']] = pd.Series(values, copy=False)
+        df = pd.DataFrame(columns, copy=False)
+        if manifest['index']:
+            df.index = pd.read_pickle(os.path.join(path, manifest['index'])).index
+        arrays = {attr: np.load(os.path.join(path, f'cube.{attr}.npy'), mmap_mode='r') for attr in self.CUBE_ARRAYS}
+        cube = DailyCube.from_arrays(arrays['days'], manifest['consultoras'], arrays['blank'],
+                                     arrays['counts'], arrays['cumulative'])
+        return df, cube
+
+
+shared_store = SharedStore(SHARED_DIR)
+
+
+def follow_shared_store():
+    """Publica a versão apontada pelo SharedStore, se for outra que a vigente.
+
+    Usado pelos processos que não baixam a planilha: todos passam a servir a mesma
+    versão, gravada uma vez pelo processo que fez a coleta.
+    """
+    name = shared_store.current()
+    ds = current_dataset()
+    if name is None or (ds is not None and ds.content_hash == shared_store.content_hash(name)):
+        return ds
+    df, cube = shared_store.open(name)
+    return publish_dataset(df, content_hash=shared_store.content_hash(name), cube=cube)
+
+
+def refresh_dataset():
+    """Busca a planilha e publica nova versão somente se os dados mudaram."""
+    new_df = get_leads_data()
+    ds = current_dataset()
+    if ds is not None and new_df is ds.df:
+        return ds
+    return publish_dataset(new_df)
+
+
+class ProcessLock:
+    """Lock exclusivo não bloqueante sobre um arquivo, mantido até o fim do processo.
+
+    O sistema libera o lock quando o processo termina, então outro processo assume no
+    próximo acquire(). Não deve ser adquirido antes de um fork (o descritor seria herdado).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    def acquire(self):
+        if self._fh is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fh = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        print(f"Processo {os.getpid()} responsável pela coleta da planilha")
+        return True
+
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class BackgroundRefresher:
+    """Thread que atualiza os dados fora do caminho das requisições.
+
+    Roda a cada `interval` segundos (0 = somente sob demanda) e também quando
+    `request_refresh()` é chamado (botão "Atualizar dados").
+
+    Com `shared` (vários processos servindo o app), só o que detém `lock` baixa a planilha
+    e grava a versão no SharedStore; os outros verificam o ponteiro a cada `poll` segundos
+    e passam a servir a versão mapeada. Pedidos de atualização chegam ao responsável pelo arquivo REFRESH_REQUEST_FILE.
+    """
+
+    def __init__(self, interval, poll=VERSION_POLL_INTERVAL, lock=None, shared=SHARED_STORE):
+        self.interval = interval
+        self.poll = max(1, poll)
+        self.lock = lock or ProcessLock(REFRESH_LOCK_FILE)
+        self.shared = shared
+        self.busy = False
+        self.last_error = None
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, refresh_now=False):
+        if self._thread is not None:
+            return
+        if refresh_now:
+            self._wake.set()
+        self._thread = threading.Thread(target=self._run, name='leads-refresher', daemon=True)
+        self._thread.start()
+
+    def request_refresh(self):
+        if self.shared:
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                with open(REFRESH_REQUEST_FILE, 'w', encoding='utf-8') as f:
+                    f.write(datetime.now().isoformat(timespec='seconds'))
+            except OSError as e:
+                print(f"Aviso: não foi possível registrar o pedido de atualização ({e})")
+        self._wake.set()
+
+    @property
+    def pending(self):
+        return self.busy or self._wake.is_set()
+
+    def _run(self):
+        last_fetch = time.monotonic()
+        handled_request = _file_mtime(REFRESH_REQUEST_FILE)
+        while True:
+            woke = self._wake.wait(timeout=self.poll)
+            try:
+                if not self.shared or self.lock.acquire():
+                    request = _file_mtime(REFRESH_REQUEST_FILE)
+                    if woke or request != handled_request or (
+                            self.interval > 0 and time.monotonic() - last_fetch >= self.interval):
+                        self.busy = True
+                        self._wake.clear()
+                        handled_request = request
+                        last_fetch = time.monotonic()
+                        refresh_dataset()
+                    ds = current_dataset()
+                    if self.shared and shared_store.content_hash(shared_store.current()) != ds.content_hash:
+                        shared_store.write(ds)
+                else:
+                    self._wake.clear()
+                    follow_shared_store()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Erro ao atualizar dados em segundo plano: {e}")
+            finally:
+                self._wake.clear()
+                self.busy = False
+
+
+refresher = BackgroundRefresher(REFRESH_INTERVAL)
+
+
 def render_data_debug_sample():
     """Renderiza um pequeno painel com colunas detectadas e sample dos primeiros registros."""
+    df = current_dataset().df
     try:
         cols = df.columns.tolist()
         sample_records = df.head(5).to_dict('records') if not df.empty else []
@@ -74,38 +1582,8 @@ def auto_map_columns(df_local: pd.DataFrame):
     """Tenta mapear automaticamente colunas com nomes comuns para os nomes esperados no app.
     Retorna (df_mapped, mapping_applied)
     """
-    mapping = {}
-
-    # regras de mapeamento conhecidas (chave = existente, valor = desejado)
-    candidates = {
-        'Contato via WhatsApp': 'Contato via wp',
-        'Contato via Whatsapp': 'Contato via wp',
-        'Contato via wp': 'Contato via wp',
-        'ContatoWP': 'Contato via wp',
-        'Historico': 'Histórico',
-        'historico': 'Histórico',
-        'Histórico': 'Histórico',
-        'Data de Referencia': 'DataReferencia',
-        'Data Referencia': 'DataReferencia',
-        'DataReferencia': 'DataReferencia',
-        'Proposta Enviada': 'Proposta',
-        'Proposta': 'Proposta',
-        'Qualificado?': 'Qualificado',
-        'Qualificado': 'Qualificado',
-        'Positivo?': 'Positivo',
-        'Positivo': 'Positivo',
-        'Consultora ': 'Consultora',
-        'consultora': 'Consultora'
-    }
-
-    # Checar colunas do df e aplicar mapping se a chave existir
-    for col in df_local.columns:
-        c = col.strip()
-        if c in candidates and candidates[c] != c:
-            mapping[col] = candidates[c]
-        elif c in candidates and candidates[c] == c:
-            # mapeamento identidade — ainda assim padronizar strip
-            mapping[col] = candidates[c]
+    resolved = resolve_columns(df_local.columns)
+    mapping = {old: new for old, new in zip(df_local.columns, resolved) if old != new}
 
     # Aplicar mapeamento
     if mapping:
@@ -114,70 +1592,266 @@ def auto_map_columns(df_local: pd.DataFrame):
     return df_local, mapping
 
 
-def find_col(df_local, candidates):
-    """Retorna o nome da primeira coluna presente em df_local que case com qualquer string em candidates.
-    candidates pode ser lista de opções (case-insensitive compare trimmed).
+def period_slice(df, start, end):
+    """Linhas com start <= DataReferencia <= end.
+
+    O Dataset publicado está ordenado por DataReferencia (NaT no fim), então o período
+    vira um intervalo de posições achado por busca binária e o resultado é uma fatia
+    (iloc) do frame, sem máscara booleana sobre todas as linhas.
     """
-    cols = [c.strip().lower() for c in df_local.columns]
-    for cand in candidates:
-        cand_norm = cand.strip().lower()
-        for i, c in enumerate(cols):
-            if c == cand_norm:
-                return df_local.columns[i]
-    # tentativas parciais: contains
-    for cand in candidates:
-        cand_norm = cand.strip().lower()
-        for i, c in enumerate(cols):
-            if cand_norm in c or c in cand_norm:
-                return df_local.columns[i]
-    return None
+    dates = df['DataReferencia']
+    if not pd.api.types.is_datetime64_dtype(dates):
+        return df[(dates >= start) & (dates <= end)]
+    if pd.isna(start) or pd.isna(end):
+        return df.iloc[0:0]
+    values = dates.to_numpy()
+    lo = values.searchsorted(pd.Timestamp(start).to_datetime64(), side='left')
+    hi = values.searchsorted(pd.Timestamp(end).to_datetime64(), side='right')
+    return df.iloc[lo:max(lo, hi)]
+
+
+def count_by(series):
+    """value_counts ignorando categorias sem ocorrência (colunas category listam todas)."""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+
+@cached_view('consultora-kpis')
+def consultora_kpis(start, end):
+    """KPIs por consultora no período, de uma vez para todas as consultoras.
+
+    Contagens vindas do cubo diário (leads, positivos, propostas, qualificados) e do
+    motor de atraso (positivos com 7 dias ou mais); só consultoras com leads no período,
+    na ordem das categorias. Compartilhado pelas visões de performance, comparativo e
+    ranking (não alterar o DataFrame devolvido).
+    """
+    ds = current_dataset()
+    cube = ds.cube
+    columns = ['Consultora', 'Leads', 'Positivos', 'Propostas', 'Qualificados', 'Atrasados',
+               '% Positivos', '% Propostas', '% Qualificados', '% Atrasados']
+    if cube.consultoras is None:
+        return pd.DataFrame(columns=columns)
+    totals = cube.totals(start, end)[:-1]
+    atrasos = current_overdue(ds).by_consultora(7, start, end)
+    kpis = pd.DataFrame({
+        'Consultora': cube.consultoras,
+        'Leads': totals[:, M_TOTAL],
+        'Positivos': totals[:, M_POSITIVOS],
+        'Propostas': totals[:, M_PROPOSTA],
+        'Qualificados': totals[:, M_QUALIFICADO + QUALIFICADO_SIM],
+        'Atrasados': atrasos.reindex(cube.consultoras, fill_value=0).to_numpy(),
+    })
+    kpis = kpis[kpis['Leads'] > 0].reset_index(drop=True)
+    for col in ('Positivos', 'Propostas', 'Qualificados', 'Atrasados'):
+        kpis['% ' + col] = kpis[col] / kpis['Leads'] * 100
+    return kpis[columns]
 
 
 # run_auto_map callback will be defined after `app` is created to avoid referencing
 # `app` before it's defined.
 
-# Carregar dados
-df = get_google_sheets_data()
+# Carregar dados (snapshot local quando existir; senão baixar a planilha)
+publish_dataset(get_leads_data(use_snapshot=True))
 
 # Inicializar app Dash
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
+# serve_locally: bundles (react, plotly.js, ...) servidos pelo próprio app, sem CDN (funciona offline)
+app = dash.Dash(__name__, suppress_callback_exceptions=True, serve_locally=True)
 app.title = "CSLeads"
+# Aplicação WSGI para servidores de produção (serve.py: waitress no Windows, gunicorn no Linux)
+server = app.server
+
+
+def get_server(start_refresher=True):
+    """Devolve a aplicação WSGI do módulo (`server`, criada na importação) com a
+    atualização em segundo plano iniciada.
+
+    Para servidores de um processo (waitress) ou um worker por processo sem preload.
+    Com gunicorn --preload o refresher deve ser iniciado em cada worker após o fork
+    (ver serve.py), não no processo mestre.
+    """
+    if start_refresher:
+        refresher.start(refresh_now=True)
+    return server
+
+# Contadores do cache de resultados (acertos/erros por processo)
+@app.server.route('/_leads/cache-stats')
+def cache_stats():
+    return app.server.response_class(json.dumps(result_cache.stats()), mimetype='application/json')
+
+
+def dataset_status_text(ds):
+    """Texto de 'last-refresh': versão, horário da carga e estado da atualização."""
+    text = f"Dados versão {ds.version} — atualizados em {ds.loaded_at.strftime('%d/%m/%Y %H:%M:%S')}"
+    if refresher.pending:
+        text += " (atualizando...)"
+    elif refresher.last_error:
+        text += f" (falha na última atualização: {refresher.last_error})"
+    return text
+
+
+@app.server.route(app.config.routes_pathname_prefix + '_leads/version')
+def dataset_version_info():
+    """Hash e texto da versão vigente, consultados pelo navegador (leads.pollVersion)."""
+    ds = current_dataset()
+    response = flask.jsonify(version=ds.content_hash, text=dataset_status_text(ds))
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(flask.request)
+
+
+# Estáticos (bundles do Dash e assets/) e respostas comprimidos e com cache no navegador:
+# - URLs com impressão digital (/_dash-component-suites/...v3_2_0m..., /assets/...?m=) mudam
+#   a cada versão, então ficam em cache por um ano (immutable); as demais revalidam por ETag;
+# - o corpo comprimido dos estáticos é calculado uma vez por conteúdo (sha1 do original) e
+#   codificação e reaproveitado: outra URL ou query string para o mesmo arquivo não gera
+#   nova compressão nem nova entrada; o cache guarda até STATIC_CACHE_ENTRIES conteúdos;
+# - JSON dos callbacks, layout e HTML são comprimidos a cada resposta (nível mais rápido).
+_static_variants = collections.OrderedDict()
+_static_lock = threading.Lock()
+
+
+def accepted_encoding(header):
+    """Codificação a usar ('br', 'gzip' ou None) conforme o Accept-Encoding da requisição."""
+    accepted = {}
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
 
-# Layout principal
-app.layout = html.Div([
-    html.H1("CSLeads", style={'textAlign': 'center', 'marginBottom': 30}),
+def compress_bytes(data, encoding, static=False):
+    """Comprime com o nível máximo para estáticos (feito uma vez) e rápido para respostas."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=9 if static else 4)
+    return gzip.compress(data, compresslevel=9 if static else 5)
+
+
+def _is_static_request(request):
+    return request.path.startswith(('/_dash-component-suites/', app.get_asset_url('')))
+
+
+def _is_fingerprinted(request, response):
+    if request.path.startswith('/_dash-component-suites/'):
+        return response.cache_control.max_age is not None
+    return 'm' in request.args
+
+
+@app.server.after_request
+def compress_response(response):
+    request = flask.request
+    if not COMPRESS_RESPONSES or response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    static = _is_static_request(request)
+    if static:
+        if _is_fingerprinted(request, response):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+    mimetype = response.mimetype or ''
+    if not (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES):
+        return response
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+    response.vary.add('Accept-Encoding')
+    if static:
+        response.direct_passthrough = False
+        data = response.get_data()
+        digest = hashlib.sha1(data).hexdigest()
+        tag = digest[:20] + ('-' + encoding if encoding else '')
+        if request.if_none_match.contains(tag):
+            # o navegador já tem esta variante: 304 sem corpo
+            not_modified = flask.Response(status=304)
+            not_modified.set_etag(tag)
+            not_modified.vary.add('Accept-Encoding')
+            if 'Cache-Control' in response.headers:
+                not_modified.headers['Cache-Control'] = response.headers['Cache-Control']
+            return not_modified
+        response.set_etag(tag)
+        if encoding is None:
+            return response
+        with _static_lock:
+            variants = _static_variants.get(digest)
+            if variants is not None:
+                _static_variants.move_to_end(digest)
+            body = (variants or {}).get(encoding)
+        if body is None:
+            # só os corpos comprimidos ficam em memória; o original é gerado pelo Dash/Flask
+            body = compress_bytes(data, encoding, static=True)
+            with _static_lock:
+                _static_variants.setdefault(digest, {})[encoding] = body
+                _static_variants.move_to_end(digest)
+                while len(_static_variants) > STATIC_CACHE_ENTRIES:
+                    _static_variants.popitem(last=False)
+    else:
+        if encoding is None or response.direct_passthrough:
+            return response
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        body = compress_bytes(data, encoding)
+    response.direct_passthrough = False
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# Layout principal: montado a cada carregamento de página, para que uma nova sessão já
+# comece com o hash e o período da versão vigente (e não os do início do processo)
+def serve_layout():
+    ds = current_dataset()
+    df = ds.df
+    return html.Div([
+        html.H1("CSLeads", style={'textAlign': 'center', 'marginBottom': 30}),
     
-    # Botão para recarregar dados manualmente
-    html.Div([
-    html.Button("Atualizar dados", id='refresh-data', n_clicks=0, style={'marginRight': '10px'}),
-    #html.Button("Auto-map", id='auto-map', n_clicks=0, style={'marginRight': '10px'}),
-    #html.Span(id='auto-map-result', style={'fontSize': '0.9em', 'color': '#666', 'marginRight': '10px'}),
-    html.Span(id='last-refresh', style={'fontSize': '0.9em', 'color': '#666'})
-    ], style={'textAlign': 'center', 'marginBottom': '10px'}),
-
-    dcc.Tabs(id="tabs", value='tab-1', children=[
-        dcc.Tab(label='Análise Geral', value='tab-1', style={'fontSize': '18px', 'fontWeight': '600'}),
-        # Qualidade tab disabled per user request
-        # dcc.Tab(label='Qualidade', value='tab-qualidade'),
-        # Performance tab disabled per user request
-        # dcc.Tab(label='Performance', value='tab-performance'),
-        dcc.Tab(label='Contatos em Atraso', value='tab-2'),
-    ]),
+        # Botão para recarregar dados manualmente
+        html.Div([
+        html.Button("Atualizar dados", id='refresh-data', n_clicks=0, style={'marginRight': '10px'}),
+        #html.Button("Auto-map", id='auto-map', n_clicks=0, style={'marginRight': '10px'}),
+        #html.Span(id='auto-map-result', style={'fontSize': '0.9em', 'color': '#666', 'marginRight': '10px'}),
+        html.Span(id='last-refresh', style={'fontSize': '0.9em', 'color': '#666'}),
+        # Verifica periodicamente se uma nova versão dos dados foi publicada
+        dcc.Interval(id='dataset-poll', interval=BROWSER_POLL_INTERVAL * 1000),
+        dcc.Store(id='dataset-version', data=ds.content_hash)
+        ], style={'textAlign': 'center', 'marginBottom': '10px'}),
+
+        dcc.Tabs(id="tabs", value='tab-1', children=[
+            dcc.Tab(label='Análise Geral', value='tab-1', style={'fontSize': '18px', 'fontWeight': '600'}),
+            # Qualidade tab disabled per user request
+            # dcc.Tab(label='Qualidade', value='tab-qualidade'),
+            # Performance tab disabled per user request
+            # dcc.Tab(label='Performance', value='tab-performance'),
+            dcc.Tab(label='Contatos em Atraso', value='tab-2'),
+        ]),
     
-    html.Div(id='tab-content'),
-
-    # Sinal oculto para disparar callbacks quando os dados forem recarregados
-    html.Div(id='refresh-signal', style={'display': 'none'})
-    ,
-    # Store para consultora selecionada (ao clicar no card)
-    dcc.Store(id='selected-consultora', data='')
-    ,
-    # Store para período selecionado na aba Análise Geral (permitir que outras abas leiam)
-    dcc.Store(id='period-store', data={
-        'start': (df['DataReferencia'].min().strftime('%Y-%m-%d') if ('DataReferencia' in df.columns and not df['DataReferencia'].dropna().empty) else None),
-        'end': (df['DataReferencia'].max().strftime('%Y-%m-%d') if ('DataReferencia' in df.columns and not df['DataReferencia'].dropna().empty) else None)
-    })
-])
+        html.Div(id='tab-content'),
+
+        # Sinal oculto para disparar callbacks quando os dados forem recarregados
+        html.Div(id='refresh-signal', style={'display': 'none'})
+        ,
+        # Store para consultora selecionada (ao clicar no card)
+        dcc.Store(id='selected-consultora', data='')
+        ,
+        # Store para período selecionado na aba Análise Geral (permitir que outras abas leiam)
+        dcc.Store(id='period-store', data={
+            'start': (df['DataReferencia'].min().strftime('%Y-%m-%d') if ('DataReferencia' in df.columns and not df['DataReferencia'].dropna().empty) else None),
+            'end': (df['DataReferencia'].max().strftime('%Y-%m-%d') if ('DataReferencia' in df.columns and not df['DataReferencia'].dropna().empty) else None)
+        })
+    ])
+
+
+app.layout = serve_layout
 
 
 @app.callback(
@@ -187,11 +1861,12 @@ app.layout = html.Div([
 )
 def run_auto_map(n_clicks):
     if n_clicks and n_clicks > 0:
-        global df
+        df = current_dataset().df
         before_cols = df.columns.tolist()
         df, mapping = auto_map_columns(df)
         after_cols = df.columns.tolist()
         if mapping:
+            publish_dataset(df)
             return f"Auto-map aplicado: {mapping}"
         else:
             return "Auto-map não encontrou colunas a renomear"
@@ -199,6 +1874,7 @@ def run_auto_map(n_clicks):
 
 # Layout da Aba 1 - Análise Geral
 def create_tab1_layout():
+    df = current_dataset().df
     # usar a última data disponível em df como padrão
     max_date = None
     if 'DataReferencia' in df.columns and not df['DataReferencia'].dropna().empty:
@@ -242,8 +1918,9 @@ def create_tab1_layout():
         html.Br(),
         html.Br(),
         
-        # Cards de resumo
+        # Cards de resumo (e o estado do esqueleto já desenhado, para atualizações parciais)
         html.Div(id='summary-cards'),
+        dcc.Store(id='summary-cards-state'),
         
         html.Br(),
         
@@ -296,13 +1973,42 @@ def create_tab2_layout():
 
         # Cards de contatos em atraso por consultora
         html.Div(id='overdue-cards'),
+        dcc.Store(id='overdue-cards-state'),
         
         html.Br(),
         
         # Tabela de contatos em atraso
         html.Div([
             html.H3("Contatos em Atraso"),
-            html.Div(id='overdue-table')
+            html.Div([
+                dash_table.DataTable(
+                    id='overdue-datatable',
+                    data=[],
+                    columns=[],
+                    page_action='custom',
+                    page_current=0,
+                    page_size=OVERDUE_PAGE_SIZE,
+                    page_count=1,
+                    sort_action='custom',
+                    sort_mode='single',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query='',
+                    filter_options={'case': 'insensitive'},
+                    style_cell={'textAlign': 'left', 'whiteSpace': 'normal', 'height': 'auto'},
+                    style_header={'backgroundColor': 'lightcoral', 'fontWeight': 'bold'},
+                    style_data_conditional=[
+                        {
+                            'if': {'filter_query': '{DiasAtraso} >= 15'},
+                            'backgroundColor': '#ffcccc',
+                        },
+                        {
+                            'if': {'filter_query': '{DiasAtraso} >= 30'},
+                            'backgroundColor': '#ff9999',
+                        }
+                    ]
+                )
+            ], id='overdue-table')
         ])
     ])
 
@@ -390,471 +2096,355 @@ def render_content(active_tab):
         return create_tab2_layout()
 
 
-@app.callback(Output('period-badge-qualidade', 'children'), Input('period-store', 'data'))
-def update_badge_qualidade(period_store):
-    if period_store and period_store.get('start') and period_store.get('end'):
-        try:
-            s = pd.to_datetime(period_store.get('start')).strftime('%d/%m/%Y')
-            e = pd.to_datetime(period_store.get('end')).strftime('%d/%m/%Y')
-            return html.Span(f'Período: {s} — {e}', style={'fontWeight': '600'})
-        except Exception:
-            return ''
-    return ''
-
-
-@app.callback(Output('period-badge-performance', 'children'), Input('period-store', 'data'))
-def update_badge_performance(period_store):
-    if period_store and period_store.get('start') and period_store.get('end'):
-        try:
-            s = pd.to_datetime(period_store.get('start')).strftime('%d/%m/%Y')
-            e = pd.to_datetime(period_store.get('end')).strftime('%d/%m/%Y')
-            return html.Span(f'Período: {s} — {e}', style={'fontWeight': '600'})
-        except Exception:
-            return ''
-    return ''
+# Callbacks só de interface rodam no navegador (assets/leads.js), sem requisição ao servidor
+app.clientside_callback(
+    ClientsideFunction(namespace='leads', function_name='periodBadge'),
+    Output('period-badge-qualidade', 'children'),
+    Input('period-store', 'data')
+)
 
+app.clientside_callback(
+    ClientsideFunction(namespace='leads', function_name='periodBadge'),
+    Output('period-badge-performance', 'children'),
+    Input('period-store', 'data')
+)
 
-@app.callback(
+# período escolhido na aba Análise Geral, lido pelas outras abas
+app.clientside_callback(
+    ClientsideFunction(namespace='leads', function_name='syncPeriodStore'),
     Output('period-store', 'data'),
     [Input('date-picker-start', 'date'), Input('date-picker-end', 'date')],
     prevent_initial_call=False
 )
-def sync_period_store(start_date, end_date):
-    # se date pickers existirem, armazenar; caso contrário manter o existente
-    data = {'start': None, 'end': None}
-    if start_date:
-        try:
-            data['start'] = pd.to_datetime(start_date).strftime('%Y-%m-%d')
-        except Exception:
-            data['start'] = None
-    if end_date:
-        try:
-            data['end'] = pd.to_datetime(end_date).strftime('%Y-%m-%d')
-        except Exception:
-            data['end'] = None
-    return data
 
-# Callback para cards de resumo na aba 1
+# Aba 1 (Análise Geral): cards, pizza e tabela diária saem de um único callback, com o
+# período convertido uma vez e os totais do cubo diário calculados uma vez por interação
 @app.callback(
     Output('summary-cards', 'children'),
+    Output('summary-cards-state', 'data'),
+    Output('qualificado-pie-chart', 'figure'),
+    Output('daily-summary-data-table', 'data'),
+    Output('daily-summary-data-table', 'columns'),
     [Input('date-picker-start', 'date'),
      Input('date-picker-end', 'date'),
-     Input('refresh-data', 'n_clicks')]
+     Input('dataset-version', 'data'),
+     Input('daily-summary-data-table', 'sort_by')],
+    [State('summary-cards-state', 'data')]
 )
-def update_summary_cards(start_date, end_date, n_clicks):
+def update_analise_geral(start_date, end_date, data_version, sort_by, cards_state):
+    # clique no cabeçalho da tabela só reordena a tabela diária
+    if dash.ctx.triggered_id == 'daily-summary-data-table':
+        cards, cards_state, pie = dash.no_update, dash.no_update, dash.no_update
+    else:
+        ds, values, pie = analise_geral_period(start_date, end_date)
+        if values is None:
+            cards, cards_state = html.Div(), None
+        else:
+            # mesmo esqueleto no navegador: só os números que mudaram (Patch). Esqueleto,
+            # caminhos e assinatura vêm da mesma versão (ds) usada nos valores
+            paths = summary_card_paths(len(ds.colors))
+            cards, cards_state = render_cards(cards_state, ds.content_hash, paths, values,
+                                              lambda: build_summary_skeleton(ds))
+    data, columns = daily_summary_table(start_date, end_date, sort_by)
+    return cards, cards_state, pie, data, columns
+
+
+@cached_view('analise-geral')
+def analise_geral_period(start_date, end_date):
+    """(Dataset usado, valores dos cards de resumo, pizza de Qualificado) do período, com os
+    mesmos totais do cubo."""
     if not start_date or not end_date:
-        return html.Div()
+        return None, None, {}
 
     # Converter inputs de data para datetime
     try:
         start = pd.to_datetime(start_date)
         end = pd.to_datetime(end_date)
     except Exception:
-        return html.Div()
+        return None, None, {}
 
-    # Filtrar dados por período
-    if 'DataReferencia' in df.columns:
-        filtered_df = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)]
-    else:
-        filtered_df = pd.DataFrame()
+    ds = current_dataset()
+    # Totais do período a partir do cubo diário: matriz (consultora, métrica)
+    totals = ds.cube.totals(start, end)
+    return ds, summary_card_values(ds, totals, start, end), build_pie_chart(ds, totals)
 
-    # Registros sem consultora definida
-    if 'Consultora' in filtered_df.columns:
-        sem_consultora_df = filtered_df[filtered_df['Consultora'].isna() | (filtered_df['Consultora'].astype(str).str.strip() == '')]
-    else:
-        sem_consultora_df = pd.DataFrame()
-
-    total_sem_consultora = len(sem_consultora_df)
 
-    # Agrupar por DataReferencia e contar, ordenando por data crescente
-    if not sem_consultora_df.empty and 'DataReferencia' in sem_consultora_df.columns:
-        # Agrupa por DataReferencia (datetime), ordena crescente
-        sem_consultora_group = sem_consultora_df.groupby(sem_consultora_df['DataReferencia']).size().sort_index()
-        tooltip_lines = [f"{dt.strftime('%d/%m/%Y')}: {qtde}" for dt, qtde in sem_consultora_group.items()]
-        tooltip_text = '\n'.join(tooltip_lines)
-    else:
-        tooltip_text = "Nenhum registro sem consultora no período."
-
-    sem_consultora_card = html.Div([
-        html.H4(f"{total_sem_consultora}", style={'margin': '0', 'fontSize': '2em', 'color': '#333'}),
-        html.P("Sem consultora", style={'margin': '0'})
-    ], style={'textAlign': 'center', 'backgroundColor': "#f56e5f", 'padding': '20px',
-              'borderRadius': '5px', 'margin': '0', 'width': '180px'}, title=tooltip_text)
+@cached_view('daily-summary')
+def daily_summary_table(start_date, end_date, sort_by):
+    """Linhas e colunas da tabela resumo por dia."""
+    # Se datas não estiverem definidas, retornar vazio (DataTable já existe no layout)
     if not start_date or not end_date:
-        return html.Div()
+        return [], []
 
     # Converter inputs de data para datetime
     try:
         start = pd.to_datetime(start_date)
         end = pd.to_datetime(end_date)
     except Exception:
-        return html.Div()
+        return [], []
 
-    # Filtrar dados por período
-    if 'DataReferencia' in df.columns:
-        filtered_df = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)]
-    else:
-        filtered_df = pd.DataFrame()
+    return build_daily_summary(current_dataset(), start, end, sort_by)
 
-    # Calcular métricas
-    total_registros = len(filtered_df)
-    positivos = len(filtered_df[filtered_df['Positivo'] == 'Sim']) if 'Positivo' in filtered_df.columns else 0
-    negativos = len(filtered_df[filtered_df['Positivo'] == 'Não']) if 'Positivo' in filtered_df.columns else 0
 
-    # Registros por consultora
-    if 'Consultora' in filtered_df.columns:
-        por_consultora = filtered_df['Consultora'].value_counts()
+def tree_set(node, path, value):
+    """Atribui `value` no caminho (como o de um Patch: 'props', 'children', índices, chaves
+    de style) de uma árvore de componentes."""
+    for key in path[:-1]:
+        if isinstance(node, (list, dict)):
+            node = node[key]
+        elif key != 'props':
+            node = getattr(node, key)
+    if isinstance(node, (list, dict)):
+        node[path[-1]] = value
     else:
-        print("Aviso: Coluna 'Consultora' não encontrada. Colunas disponíveis:", filtered_df.columns.tolist())
-        por_consultora = pd.Series()  # Serie vazia
-
-    # Paleta pastéis (fallback)
-    pastel_palette = ['#FDEBD0', '#E8F8F5', '#F6EBF6', '#FEF9E7', '#E8F6FF', '#FFF0F5', '#FBEFF2', '#EAF8F1']
-
-    # Mapeamento explícito nome -> cor (edite conforme sua preferência)
-    consultora_color_map = {
-        'Lidiane': '#DCEEFF',   # azul claro
-        'Lidiane ': '#DCEEFF',  # possível variação com espaço
-        'Jéssica': '#F6E8F6',   # rosa / lilás claro
-        'Jessica': '#F6E8F6',   # sem acento
-        # adicione outros nomes conhecidos aqui
-    }
-
-    # função utilitária para obter cor por nome com fallback determinístico
-    def consultora_color(name: str) -> str:
-        try:
-            if not name:
-                return pastel_palette[0]
-            key = str(name).strip()
-            if key in consultora_color_map:
-                return consultora_color_map[key]
-            # fallback determinístico baseado em hash
-            idx = int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % len(pastel_palette)
-            return pastel_palette[idx]
-        except Exception:
-            return pastel_palette[0]
-
-    # construir os cards pais (total, positivos, negativos, whatsapp, proposta)
-    total_card = html.Div([
-        html.H4(f"{total_registros}", style={'margin': '0', 'fontSize': '2em'}),
-        html.P("Total de registros", style={'margin': '0'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#f0f0f0', 'padding': '20px',
-             'borderRadius': '5px', 'margin': '0', 'width': '180px'})
-
-    pos_parent = html.Div([
-        html.H4(f"{positivos}", style={'margin': '0', 'fontSize': '2em', 'color': 'green'}),
-        html.P("Positivos", style={'margin': '0'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#e8f7ea', 'padding': '20px',
-              'borderRadius': '5px', 'margin': '0', 'width': '260px'})
-
-    neg_parent = html.Div([
-        html.H4(f"{negativos}", style={'margin': '0', 'fontSize': '2em', 'color': 'red'}),
-        html.P("Negativos", style={'margin': '0'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#fdecea', 'padding': '20px',
-              'borderRadius': '5px', 'margin': '0', 'width': '260px'})
-
-    whatsapp_total = 0
-    if 'Contato via wp' in filtered_df.columns:
-        whatsapp_total = filtered_df[filtered_df['Contato via wp'].astype(str).str.strip().str.lower() == 'sim'].shape[0]
-    whatsapp_parent = html.Div([
-        html.H4(f"{whatsapp_total}", style={'margin': '0', 'fontSize': '2em', 'color': '#2b8c6b'}),
-        html.P("Contatos WhatsApp", style={'margin': '0'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#eefaf7', 'padding': '20px',
-              'borderRadius': '5px', 'margin': '0', 'width': '260px'})
-
-    proposta_total = 0
-    if 'Proposta' in filtered_df.columns:
-        proposta_total = filtered_df[filtered_df['Proposta'].astype(str).str.strip().str.lower() == 'sim'].shape[0]
-    proposta_parent = html.Div([
-        html.H4(f"{proposta_total}", style={'margin': '0', 'fontSize': '2em', 'color': '#6a4a9f'}),
-        html.P("Proposta", style={'margin': '0'})
-    ], style={'textAlign': 'center', 'backgroundColor': '#f3eef9', 'padding': '20px',
-              'borderRadius': '5px', 'margin': '0', 'width': '260px'})
-
-    # criar linhas de children para cada grupo
-    # POSITIVOS children
-    pos_children = []
-    if 'Positivo' in filtered_df.columns and 'Consultora' in filtered_df.columns:
-        pos_by_cons = filtered_df[filtered_df['Positivo'] == 'Sim']['Consultora'].value_counts()
-    else:
-        pos_by_cons = pd.Series()
-
-    for consultora, cnt in pos_by_cons.items():
-        bg = consultora_color(consultora)
-        pos_children.append(html.Div([
-            html.H4(f"{cnt}", style={'margin': '0', 'fontSize': '1.6em', 'color': 'black'}),
-            html.P(f"{consultora}", style={'margin': '0', 'fontSize': '0.9em'})
-        ], style={'textAlign': 'center', 'backgroundColor': bg, 'padding': '14px', 'borderRadius': '6px',
-                  'margin': '6px', 'width': '160px'}))
+        setattr(node, path[-1], value)
 
-    # NEGATIVOS children
-    neg_children = []
-    if 'Positivo' in filtered_df.columns and 'Consultora' in filtered_df.columns:
-        neg_by_cons = filtered_df[filtered_df['Positivo'] == 'Não']['Consultora'].value_counts()
-    else:
-        neg_by_cons = pd.Series()
 
-    for consultora, cnt in neg_by_cons.items():
-        bg = consultora_color(consultora)
-        neg_children.append(html.Div([
-            html.H4(f"{cnt}", style={'margin': '0', 'fontSize': '1.6em', 'color': 'black'}),
-            html.P(f"{consultora}", style={'margin': '0', 'fontSize': '0.9em'})
-        ], style={'textAlign': 'center', 'backgroundColor': bg, 'padding': '14px', 'borderRadius': '6px',
-                  'margin': '6px', 'width': '160px'}))
+def render_cards(state, signature, paths, values, build_skeleton):
+    """Resposta de um grupo de cards com esqueleto fixo: (children ou Patch, novo estado).
 
-    # WHATSAPP children
-    whatsapp_children = []
-    if 'Contato via wp' in filtered_df.columns and 'Consultora' in filtered_df.columns:
-        wp_by_cons = filtered_df[filtered_df['Contato via wp'].astype(str).str.strip().str.lower() == 'sim']['Consultora'].value_counts()
+    O esqueleto (um card por consultora, cores e estilos) só muda com `signature` (versão
+    dos dados). Se o navegador já tem esse esqueleto (estado guardado num dcc.Store), a
+    resposta é um Patch só com os valores (`values`, um por caminho de `paths`) que mudaram;
+    senão, a árvore completa com os valores preenchidos.
+    """
+    # textos longos (ex.: tooltip por dia) entram no estado só como hash, para não irem e
+    # voltarem a cada requisição
+    digests = [hashlib.md5(v.encode('utf-8')).hexdigest()[:12] if isinstance(v, str) and len(v) > 32 else v
+               for v in values]
+    new_state = {'signature': signature, 'values': digests}
+    if state and state.get('signature') == signature and len(state.get('values') or []) == len(values):
+        changed = [(path, new) for path, old, digest, new in zip(paths, state['values'], digests, values)
+                   if old != digest]
+        if not changed:
+            return dash.no_update, dash.no_update
+        patch = dash.Patch()
+        for path, value in changed:
+            target = patch
+            for key in path[:-1]:
+                target = target[key]
+            target[path[-1]] = value
+        return patch, new_state
+    tree = build_skeleton()
+    for path, value in zip(paths, values):
+        tree_set(tree, path, value)
+    return tree, new_state
+
+
+def ranking_positions(counts):
+    """Posição de cada item na ordem decrescente de contagem (empates na ordem original)."""
+    positions = np.empty(len(counts), dtype=np.int64)
+    positions[np.argsort(-np.asarray(counts), kind='stable')] = np.arange(len(counts))
+    return positions
+
+
+# Colunas dos cards de resumo (depois da coluna "Sem consultora"):
+# (rótulo, métrica do cubo, cor do número, fundo do card pai, largura)
+SUMMARY_COLUMNS = [
+    ('Total de registros', M_TOTAL, None, '#f0f0f0', '180px'),
+    ('Positivos', M_POSITIVOS, 'green', '#e8f7ea', '260px'),
+    ('Contatos WhatsApp', M_CONTATO_WP, '#2b8c6b', '#eefaf7', '260px'),
+    ('Proposta', M_PROPOSTA, '#6a4a9f', '#f3eef9', '260px'),
+    ('Negativos', M_NEGATIVOS, 'red', '#fdecea', '260px'),
+]
+# texto do número dentro de um card (card > H4 > texto)
+CARD_COUNT_PATH = ('props', 'children', 0, 'props', 'children')
+
+
+def summary_card_paths(n_consultoras):
+    """Caminhos dos valores variáveis dos cards de resumo, na ordem de summary_card_values."""
+    sem_consultora = ('props', 'children', 0, 'props', 'children', 0)
+    paths = [sem_consultora + CARD_COUNT_PATH, sem_consultora + ('props', 'title')]
+    for c in range(1, len(SUMMARY_COLUMNS) + 1):
+        paths.append(('props', 'children', c, 'props', 'children', 0) + CARD_COUNT_PATH)
+    for c in range(1, len(SUMMARY_COLUMNS) + 1):
+        for i in range(n_consultoras):
+            card = ('props', 'children', c, 'props', 'children', 1, 'props', 'children', i)
+            paths += [card + CARD_COUNT_PATH, card + ('props', 'style', 'order'), card + ('props', 'style', 'display')]
+    return paths
+
+
+def summary_card_values(ds, totals, start, end):
+    """Valores dos cards de resumo do período (números, ordem e visibilidade dos cards por
+    consultora), na ordem de summary_card_paths."""
+    cube = ds.cube
+
+    # Registros sem consultora definida (vazia ou só espaços)
+    total_sem_consultora = int(totals[cube.blank, M_TOTAL].sum()) if cube.consultoras is not None else 0
+
+    # Contagem por dia, em ordem crescente de data
+    if total_sem_consultora:
+        days, day_counts = cube.daily(start, end)
+        per_day = day_counts[:, cube.blank, M_TOTAL].sum(axis=1)
+        tooltip_lines = [f"{pd.Timestamp(dt).strftime('%d/%m/%Y')}: {qtde}" for dt, qtde in zip(days, per_day) if qtde]
+        tooltip_text = '\n'.join(tooltip_lines)
     else:
-        wp_by_cons = pd.Series()
-
-    for consultora, cnt in wp_by_cons.items():
-        bg = consultora_color(consultora)
-        whatsapp_children.append(html.Div([
-            html.H4(f"{cnt}", style={'margin': '0', 'fontSize': '1.6em', 'color': 'black'}),
-            html.P(f"{consultora}", style={'margin': '0', 'fontSize': '0.9em'})
-        ], style={'textAlign': 'center', 'backgroundColor': bg, 'padding': '14px', 'borderRadius': '6px',
-                  'margin': '6px', 'width': '160px'}))
+        tooltip_text = "Nenhum registro sem consultora no período."
 
-    # PROPOSTA children
-    proposta_children = []
-    if 'Proposta' in filtered_df.columns and 'Consultora' in filtered_df.columns:
-        prop_by_cons = filtered_df[filtered_df['Proposta'].astype(str).str.strip().str.lower() == 'sim']['Consultora'].value_counts()
-    else:
-        prop_by_cons = pd.Series()
+    values = [f"{total_sem_consultora}", tooltip_text]
+    values += [f"{int(totals[:, metric].sum())}" for _, metric, _, _, _ in SUMMARY_COLUMNS]
+    if cube.consultoras is None:
+        print("Aviso: Coluna 'Consultora' não encontrada. Colunas disponíveis:", ds.df.columns.tolist())
+        return values
 
-    for consultora, cnt in prop_by_cons.items():
-        bg = consultora_color(consultora)
-        proposta_children.append(html.Div([
-            html.H4(f"{cnt}", style={'margin': '0', 'fontSize': '1.6em', 'color': 'black'}),
-            html.P(f"{consultora}", style={'margin': '0', 'fontSize': '0.9em'})
-        ], style={'textAlign': 'center', 'backgroundColor': bg, 'padding': '14px', 'borderRadius': '6px',
-                  'margin': '6px', 'width': '160px'}))
+    # cards por consultora: só as que têm registros, da maior para a menor contagem
+    for _, metric, _, _, _ in SUMMARY_COLUMNS:
+        counts = totals[:-1, metric]
+        for count, position in zip(counts.tolist(), ranking_positions(counts).tolist()):
+            values += [f"{count}", position, 'block' if count > 0 else 'none']
+    return values
 
-    # TOTAL por consultora (coluna 1) - quantidade total de registros por consultora
-    total_children = []
-    if 'Consultora' in filtered_df.columns:
-        total_by_cons = filtered_df['Consultora'].value_counts()
-    else:
-        total_by_cons = pd.Series()
 
-    for consultora, cnt in total_by_cons.items():
-        bg = consultora_color(consultora)
-        total_children.append(html.Div([
-            html.H4(f"{cnt}", style={'margin': '0', 'fontSize': '1.6em', 'color': 'black'}),
-            html.P(f"{consultora}", style={'margin': '0', 'fontSize': '0.9em'})
-        ], style={'textAlign': 'center', 'backgroundColor': bg, 'padding': '14px', 'borderRadius': '6px',
-                  'margin': '6px', 'width': '160px'}))
+def build_summary_skeleton(ds):
+    """Esqueleto dos cards de resumo da versão: coluna "Sem consultora" e, para cada métrica,
+    o card pai e um card por consultora (cor pré-calculada em Dataset.colors). Números,
+    ordem e visibilidade vêm de summary_card_values (ver render_cards)."""
+    sem_consultora_card = html.Div([
+        html.H4("", style={'margin': '0', 'fontSize': '2em', 'color': '#333'}),
+        html.P("Sem consultora", style={'margin': '0'})
+    ], style={'textAlign': 'center', 'backgroundColor': "#f56e5f", 'padding': '20px',
+              'borderRadius': '5px', 'margin': '0', 'width': '180px'})
 
     # montar layout em colunas: cada coluna contém o card pai e, abaixo, os cards das consultoras
-    col_sem_consultora = html.Div([
+    columns = [html.Div([
         sem_consultora_card
-    ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': '180px', 'gap': '14px'})
-
-    col_total = html.Div([
-        total_card,
-        html.Div(total_children, style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'gap': '8px'})
-    ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': '180px', 'gap': '14px'})
-
-    col_pos = html.Div([
-        pos_parent,
-        html.Div(pos_children, style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'gap': '8px'})
-    ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': '260px', 'gap': '14px'})
-
-    col_neg = html.Div([
-        neg_parent,
-        html.Div(neg_children, style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'gap': '8px'})
-    ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': '260px', 'gap': '14px'})
-
-    col_wp = html.Div([
-        whatsapp_parent,
-        html.Div(whatsapp_children, style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'gap': '8px'})
-    ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': '260px', 'gap': '14px'})
+    ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': '180px', 'gap': '14px'})]
+
+    for label, _, color, background, width in SUMMARY_COLUMNS:
+        count_style = {'margin': '0', 'fontSize': '2em'}
+        if color:
+            count_style['color'] = color
+        parent = html.Div([
+            html.H4("", style=count_style),
+            html.P(label, style={'margin': '0'})
+        ], style={'textAlign': 'center', 'backgroundColor': background, 'padding': '20px',
+                  'borderRadius': '5px', 'margin': '0', 'width': width})
+
+        children = [html.Div([
+            html.H4("", style={'margin': '0', 'fontSize': '1.6em', 'color': 'black'}),
+            html.P(f"{consultora}", style={'margin': '0', 'fontSize': '0.9em'})
+        ], style={'textAlign': 'center', 'backgroundColor': bg, 'padding': '14px', 'borderRadius': '6px',
+                  'margin': '6px', 'width': '160px'}) for consultora, bg in zip(ds.cube.consultoras or [], ds.colors)]
 
-    col_prop = html.Div([
-        proposta_parent,
-        html.Div(proposta_children, style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'gap': '8px'})
-    ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': '260px', 'gap': '14px'})
+        columns.append(html.Div([
+            parent,
+            html.Div(children, style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'gap': '8px'})
+        ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'width': width, 'gap': '14px'}))
 
     # linha de colunas
-    columns_row = html.Div([
-        col_sem_consultora,
-        col_total,
-        col_pos,
-        col_wp,
-        col_prop,
-        col_neg
-    ], style={'display': 'flex', 'justifyContent': 'center', 'gap': '48px', 'width': '100%', 'marginTop': '8px'})
-
-    return columns_row
-
-# Callback para gráfico de pizza
-@app.callback(
-    Output('qualificado-pie-chart', 'figure'),
-    [Input('date-picker-start', 'date'),
-     Input('date-picker-end', 'date'),
-     Input('refresh-data', 'n_clicks')]
-)
-def update_pie_chart(start_date, end_date, n_clicks):
-    # Se datas não fornecidas, não renderizar
-    if not start_date or not end_date:
-        return {}
+    return html.Div(columns, style={'display': 'flex', 'justifyContent': 'center', 'gap': '48px', 'width': '100%', 'marginTop': '8px'})
+
+# Pizza, funil e barras saem como dicts já no formato do JSON da resposta (listas Python),
+# montados direto dos agregados: sem o DataFrame intermediário do plotly.express nem a
+# validação de go.Figure a cada chamada. O template padrão é validado e convertido uma vez,
+# na importação, e compartilhado por todas as figuras; em result_cache (cached_view) fica o
+# dict pronto, que o Dash só precisa codificar.
+FIGURE_TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+FIGURE_COLORWAY = FIGURE_TEMPLATE['layout']['colorway']
+
+
+def figure_dict(data, **layout):
+    """Figura {'data', 'layout'} com o template pré-validado."""
+    layout['template'] = FIGURE_TEMPLATE
+    return {'data': data, 'layout': layout}
+
+
+def message_figure(text, title):
+    """Figura vazia com um aviso no centro (colunas ausentes etc.)."""
+    return figure_dict([], title={'text': title},
+                       annotations=[{'text': text, 'xref': 'paper', 'yref': 'paper', 'showarrow': False}])
+
+
+def bar_figure(x, y, x_title, y_title, orientation='v', **layout):
+    """Barras de uma série, como o px.bar sem cor por grupo (mesmos traço e eixos)."""
+    return figure_dict([{
+        'type': 'bar', 'x': x, 'y': y, 'orientation': orientation, 'name': '', 'legendgroup': '',
+        'showlegend': False, 'textposition': 'auto', 'xaxis': 'x', 'yaxis': 'y',
+        'hovertemplate': f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>',
+        'marker': {'color': FIGURE_COLORWAY[0], 'pattern': {'shape': ''}},
+    }], barmode='relative', legend={'tracegroupgap': 0},
+        xaxis={'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': x_title}},
+        yaxis={'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': y_title}}, **layout)
+
+
+def pie_figure(labels, values, colors=None, pull=None, **layout):
+    """Pizza com rótulo "Sim — 12 (40%)" dentro das fatias e o mesmo texto no hover."""
+    trace = {
+        'type': 'pie', 'labels': labels, 'values': values, 'name': '', 'legendgroup': '', 'showlegend': True,
+        'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+        # texttemplate controla exatamente o texto dentro das fatias
+        'texttemplate': '%{label} — %{value} (%{percent:.0%})', 'textposition': 'inside',
+        'hovertemplate': '%{label}: %{value} (%{percent:.0%})<extra></extra>',
+        'marker': {'colors': colors or [], 'line': {'color': 'white', 'width': 1}},
+    }
+    if pull is not None:
+        trace['pull'] = pull
+    layout.setdefault('margin', {'t': 60})
+    return figure_dict([trace], legend={'tracegroupgap': 0}, **layout)
 
-    # Converter inputs de data para datetime
-    try:
-        start = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-    except Exception:
-        return {}
 
-    # Filtrar pelo período usando DataReferencia
+def build_pie_chart(ds, totals):
+    """Gráfico de pizza de Qualificado a partir dos totais (consultora, métrica) do período."""
+    df = ds.df
     if 'DataReferencia' in df.columns:
-        filtered_df = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)]
+        totals = totals.sum(axis=0)
     else:
         # sem coluna DataReferencia, não há como filtrar por período
-        return px.pie(values=[1], names=['Dados não disponíveis'], title="Distribuição de Qualificados")
+        return pie_figure(['Dados não disponíveis'], [1], title={'text': 'Distribuição de Qualificados'})
 
-    # Normalizar e mapear para três categorias
-    if 'Qualificado' not in filtered_df.columns or filtered_df.empty:
-        qualificado_counts = pd.Series([0], index=['Nenhum'])
-    else:
-        def map_qualificado(v):
-            try:
-                s = str(v).strip().lower()
-            except Exception:
-                return 'Não'
-            if s == '' or s in ['nan', 'none', 'na']:
-                return 'Não'
-            if 'sim' in s:
-                return 'Sim'
-            if 'talvez' in s or 'maybe' in s:
-                return 'Talvez'
-            if 'não' in s or 'nao' in s or s.startswith('n'):
-                return 'Não'
-            return 'Não'
-
-        mapped = filtered_df['Qualificado'].apply(map_qualificado)
-        qualificado_counts = mapped.value_counts()
-
-    # Garantir ordem consistente: Sim, Talvez, Não
-    order = ['Sim', 'Talvez', 'Não']
-    labels = [lab for lab in order if lab in qualificado_counts.index]
-    values = [int(qualificado_counts.get(lab, 0)) for lab in labels]
-
-    if sum(values) == 0:
-        fig = px.pie(values=[1], names=['Dados não disponíveis'])
-    else:
-        fig = px.pie(values=values, names=labels)
+    # Três categorias já normalizadas no cubo, em ordem consistente: Sim, Talvez, Não
+    labels, values = [], []
+    if 'Qualificado' in df.columns and totals[M_TOTAL] > 0:
+        for code, label in QUALIFICADO_LABELS.items():
+            if totals[M_QUALIFICADO + code] > 0:
+                labels.append(label)
+                values.append(int(totals[M_QUALIFICADO + code]))
 
     # Paleta e efeito de destaque — tons suaves profissionais
     color_map = {'Sim': '#4a90e2', 'Talvez': '#f5b041', 'Não': '#e05252'}
     colors = [color_map.get(lab, '#888888') for lab in labels]
+    # pull destaca as fatias (efeito 'explodido' 3D-like)
+    pull = [0.08 if v > 0 else 0 for v in values]
 
-    # Mostrar rótulo no formato: "Sim — 12 (40%)" e hover com valor e percentual
-    try:
-        # texttemplate controla exatamente o texto dentro das fatias
-        fig.update_traces(
-            texttemplate='%{label} — %{value} (%{percent:.0%})',
-            textposition='inside',
-            hovertemplate='%{label}: %{value} (%{percent:.0%})<extra></extra>',
-            # aplicar pull para destacar as fatias (efeito 'explodido' 3D-like)
-            pull=[0.08 if v > 0 else 0 for v in values],
-            marker=dict(colors=colors, line=dict(color='white', width=1))
-        )
-    except Exception:
-        # fallback simples
-        fig.update_traces(textinfo='percent')
-
-    # removido background SVG para evitar faixa cinza atrás do gráfico
-
-    return fig
-
-# Callback para tabela resumo por dia
-@app.callback(
-    Output('daily-summary-data-table', 'data'),
-    Output('daily-summary-data-table', 'columns'),
-    [Input('date-picker-start', 'date'),
-     Input('date-picker-end', 'date'),
-     Input('refresh-data', 'n_clicks'),
-     Input('daily-summary-data-table', 'sort_by')]
-)
-def update_daily_summary(start_date, end_date, n_clicks, sort_by):
-    # Se datas não estiverem definidas, retornar vazio (DataTable já existe no layout)
-    if not start_date or not end_date:
-        return [], []
-
-    # Converter inputs de data para datetime
-    try:
-        start = pd.to_datetime(start_date)
-        end = pd.to_datetime(end_date)
-    except Exception:
+    if sum(values) == 0:
+        return pie_figure(['Dados não disponíveis'], [1], colors, pull)
+    return pie_figure(labels, values, colors, pull)
+
+def build_daily_summary(ds, start, end, sort_by):
+    """Tabela resumo por dia do período: (data, columns) do DataTable."""
+    # Uma linha por dia com registros no período, direto do cubo diário (somando as consultoras)
+    days, day_counts = ds.cube.daily(start, end)
+    if len(days) == 0:
         return [], []
+    per_day = day_counts.sum(axis=1)
+
+    # Atraso: contatos positivos sem retorno há 7 dias ou mais (mesmo dia de referência do motor de atraso)
+    days_diff = (current_overdue(ds).today - days).astype('int64')
+
+    summary_df = pd.DataFrame({
+        'DATA': days,
+        'Nº contatos': per_day[:, M_TOTAL],
+        'Positivos': per_day[:, M_POSITIVOS],
+        'Contatos': per_day[:, M_CONTATO_WP],
+        'Proposta': per_day[:, M_PROPOSTA],
+        'Sem retorno geral': np.where(days_diff >= 7, per_day[:, M_POSITIVOS], 0),
+    })
 
-    # Filtrar dados por período
-    if 'DataReferencia' in df.columns:
-        filtered_df = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)]
-    else:
-        filtered_df = pd.DataFrame()
-
-    # Agrupar por data
-    daily_summary = []
-
-    if not filtered_df.empty and 'DataReferencia' in filtered_df.columns:
-        unique_dates = filtered_df['DataReferencia'].dt.date.unique()
+    # Ordenação customizada enviada pelo componente (quando o usuário clica no cabeçalho);
+    # DATA ordena pela própria data, antes de formatar
+    if sort_by and isinstance(sort_by, list) and len(sort_by) > 0:
+        sort = sort_by[0]
+        col_id = sort.get('column_id')
+        direction = sort.get('direction', 'asc') == 'asc'
+        if col_id in summary_df.columns:
+            summary_df = summary_df.sort_values(col_id, ascending=direction, kind='mergesort')
     else:
-        unique_dates = []
-
-    for date_val in unique_dates:
-        day_df = filtered_df[filtered_df['DataReferencia'].dt.date == date_val]
-
-        # Calcular métricas do dia
-        total_contatos = len(day_df)
-        positivos = len(day_df[day_df['Positivo'] == 'Sim']) if 'Positivo' in day_df.columns else 0
-        contatos_wp = len(day_df[day_df['Contato via wp'] == 'Sim']) if 'Contato via wp' in day_df.columns else 0
-        propostas = len(day_df[day_df['Proposta'] == 'Sim']) if 'Proposta' in day_df.columns else 0
-
-        # Calcular atraso (contatos positivos sem retorno há mais de 7 dias)
-        days_diff = (datetime.now().date() - date_val).days
-        sem_retorno = len(day_df[day_df['Positivo'] == 'Sim']) if ('Positivo' in day_df.columns and days_diff >= 7) else 0
-
-        daily_summary.append({
-            'DATA': date_val.strftime('%d/%m/%Y'),
-            'Nº contatos': total_contatos,
-            'Positivos': positivos,
-            'Contatos': contatos_wp,
-            'Proposta': propostas,
-            'Sem retorno geral': sem_retorno
-        })
+        # comportamento padrão: ordenar DATA decrescente
+        summary_df = summary_df.iloc[::-1]
 
-    # Criar DataFrame e preparar dados/colunas para o DataTable
-    if daily_summary:
-        summary_df = pd.DataFrame(daily_summary)
-        # coluna auxiliar datetime para ordenação correta
-        summary_df['DATA_dt'] = pd.to_datetime(summary_df['DATA'], dayfirst=True, format='%d/%m/%Y', errors='coerce')
-
-        # Ordenação customizada enviada pelo componente (quando o usuário clica no cabeçalho)
-        if sort_by and isinstance(sort_by, list) and len(sort_by) > 0:
-            sort = sort_by[0]
-            col_id = sort.get('column_id')
-            direction = sort.get('direction', 'asc') == 'asc'
-            if col_id == 'DATA':
-                summary_df = summary_df.sort_values('DATA_dt', ascending=direction)
-            else:
-                # ordenar por coluna visível (se existir)
-                if col_id in summary_df.columns:
-                    summary_df = summary_df.sort_values(col_id, ascending=direction, kind='mergesort')
-        else:
-            # comportamento padrão: ordenar DATA decrescente
-            summary_df = summary_df.sort_values('DATA_dt', ascending=False)
-
-        # Preparar colunas sem a coluna auxiliar
-        out_df = summary_df.drop(columns=['DATA_dt'])
-        columns = [{"name": col, "id": col} for col in out_df.columns]
-        data = out_df.to_dict('records')
-        return data, columns
-    else:
-        return [], []
+    summary_df['DATA'] = summary_df['DATA'].dt.strftime('%d/%m/%Y')
+    columns = [{"name": col, "id": col} for col in summary_df.columns]
+    return summary_df.to_dict('records'), columns
 
 
 # -----------------
@@ -864,9 +2454,12 @@ def update_daily_summary(start_date, end_date, n_clicks, sort_by):
 
 @app.callback(
     Output('quality-kpi-cards', 'children'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_quality_kpis(start_date, end_date, n_clicks, period_store):
+@cached_view('quality-kpis')
+def update_quality_kpis(start_date, end_date, data_version, period_store):
+    ds = current_dataset()
+    df = ds.df
     # calcular KPIs: conversão geral, proposta/positivos, contato_wp/total, taxa atraso
     # Priorizar período vindo do period-store (seleção na aba Análise Geral)
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
@@ -892,10 +2485,10 @@ def update_quality_kpis(start_date, end_date, n_clicks, period_store):
                 return html.Div()
 
     # localizar colunas candidatas de forma resiliente
-    col_qual = find_col(df, ['Qualificado', 'Qualificado?'])
-    col_positivo = find_col(df, ['Positivo', 'Positivo?'])
-    col_proposta = find_col(df, ['Proposta', 'Proposta Enviada'])
-    col_contato = find_col(df, ['Contato via wp', 'Contato via WhatsApp', 'Contato via Whatsapp', 'ContatoWP'])
+    col_qual = ds.schema['qualificado']
+    col_positivo = ds.schema['positivo']
+    col_proposta = ds.schema['proposta']
+    col_contato = ds.schema['contato_wp']
 
     if not any([col_qual, col_positivo, col_proposta, col_contato]):
         return html.Div([
@@ -904,39 +2497,35 @@ def update_quality_kpis(start_date, end_date, n_clicks, period_store):
         ], style={'color': 'darkred', 'textAlign': 'center'})
 
     # filtrar pelo período (usar period_store ou DataReferencia se disponível). Se DataReferencia não existir, usar todo o df
+    period = (None, None)
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
         start = pd.to_datetime(period_store.get('start'))
         end = pd.to_datetime(period_store.get('end'))
         if 'DataReferencia' in df.columns:
-            filtered = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
+            filtered = period_slice(df, start, end)
+            period = (start, end)
         else:
-            filtered = df.copy()
+            filtered = df
     else:
         if 'DataReferencia' in df.columns:
-            filtered = df.copy()
             try:
                 start = pd.to_datetime(start_date) if start_date else df['DataReferencia'].min()
                 end = pd.to_datetime(end_date) if end_date else df['DataReferencia'].max()
-                filtered = filtered[(filtered['DataReferencia'] >= start) & (filtered['DataReferencia'] <= end)].copy()
+                filtered = period_slice(df, start, end)
+                period = (start, end)
             except Exception:
-                filtered = df.copy()
+                filtered = df
         else:
-            filtered = df.copy()
+            filtered = df
 
     total = len(filtered)
-    qualificados = len(filtered[filtered[col_qual].astype(str).str.contains('sim', case=False, na=False)]) if col_qual and col_qual in filtered.columns else 0
-    positivos = len(filtered[filtered[col_positivo] == 'Sim']) if col_positivo and col_positivo in filtered.columns else 0
-    propostas = len(filtered[filtered[col_proposta] == 'Sim']) if col_proposta and col_proposta in filtered.columns else 0
-    contatos_wp = len(filtered[filtered[col_contato] == 'Sim']) if col_contato and col_contato in filtered.columns else 0
+    qualificados = int((filtered['_qualificado'] == QUALIFICADO_SIM).sum()) if col_qual else 0
+    positivos = int((filtered['_positivo'] == 1).sum()) if col_positivo else 0
+    propostas = int(filtered['_proposta'].sum()) if col_proposta else 0
+    contatos_wp = int(filtered['_contato_wp'].sum()) if col_contato else 0
 
     # leads atrasados: usar mesma lógica da aba atrasos com 7 dias padrão
-    today = datetime.now().date()
-    if 'Positivo' in filtered.columns and 'DataReferencia' in filtered.columns:
-        atrasados = filtered[filtered['Positivo'] == 'Sim'].copy()
-        atrasados['DiasAtraso'] = atrasados['DataReferencia'].apply(lambda x: (today - x.date()).days if pd.notnull(x) else None)
-        atrasados = len(atrasados[atrasados['DiasAtraso'] >= 7])
-    else:
-        atrasados = 0
+    atrasados = current_overdue(ds).count(7, *period)
 
     # Calcular taxas com proteção contra divisão por zero
     def pct(n, d):
@@ -962,9 +2551,12 @@ def update_quality_kpis(start_date, end_date, n_clicks, period_store):
 
 @app.callback(
     Output('conversion-funnel', 'figure'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_conversion_funnel(start_date, end_date, n_clicks, period_store):
+@cached_view('conversion-funnel')
+def update_conversion_funnel(start_date, end_date, data_version, period_store):
+    ds = current_dataset()
+    df = ds.df
     # Build funnel: Total Leads → Positivos → Contato via WhatsApp → Proposta → Qualificado
     # Priorizar period-store
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
@@ -989,56 +2581,55 @@ def update_conversion_funnel(start_date, end_date, n_clicks, period_store):
                 return {}
 
     # localizar colunas
-    col_positivo = find_col(df, ['Positivo', 'Positivo?'])
-    col_contato = find_col(df, ['Contato via wp', 'Contato via WhatsApp', 'Contato via Whatsapp', 'ContatoWP'])
-    col_proposta = find_col(df, ['Proposta', 'Proposta Enviada'])
-    col_qual = find_col(df, ['Qualificado', 'Qualificado?'])
+    col_positivo = ds.schema['positivo']
+    col_contato = ds.schema['contato_wp']
+    col_proposta = ds.schema['proposta']
+    col_qual = ds.schema['qualificado']
 
     if not any([col_positivo, col_contato, col_proposta, col_qual]):
-        fig = go.Figure()
-        fig.add_annotation(text='Colunas essenciais do funil não encontradas', xref='paper', yref='paper', showarrow=False)
-        fig.update_layout(title='Colunas faltando para funil')
-        return fig
+        return message_figure('Colunas essenciais do funil não encontradas', 'Colunas faltando para funil')
 
     # filtrar pelo período
     if 'DataReferencia' in df.columns and period_store and period_store.get('start') and period_store.get('end'):
         start = pd.to_datetime(period_store.get('start'))
         end = pd.to_datetime(period_store.get('end'))
-        d = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
+        d = period_slice(df, start, end)
     elif 'DataReferencia' in df.columns:
         try:
             sd = pd.to_datetime(start_date) if start_date else df['DataReferencia'].min()
             ed = pd.to_datetime(end_date) if end_date else df['DataReferencia'].max()
-            d = df[(df['DataReferencia'] >= sd) & (df['DataReferencia'] <= ed)].copy()
+            d = period_slice(df, sd, ed)
         except Exception:
-            d = df.copy()
+            d = df
     else:
-        d = df.copy()
+        d = df
 
     total = len(d)
-    positivos = len(d[d[col_positivo] == 'Sim']) if col_positivo and col_positivo in d.columns else 0
-    contatos_wp = len(d[d[col_contato] == 'Sim']) if col_contato and col_contato in d.columns else 0
-    propostas = len(d[d[col_proposta] == 'Sim']) if col_proposta and col_proposta in d.columns else 0
-    qualificados = len(d[d[col_qual].astype(str).str.contains('sim', case=False, na=False)]) if col_qual and col_qual in d.columns else 0
+    positivos = int((d['_positivo'] == 1).sum()) if col_positivo else 0
+    contatos_wp = int(d['_contato_wp'].sum()) if col_contato else 0
+    propostas = int(d['_proposta'].sum()) if col_proposta else 0
+    qualificados = int((d['_qualificado'] == QUALIFICADO_SIM).sum()) if col_qual else 0
 
     steps = ['Total Leads', 'Positivos', 'Contato via WhatsApp', 'Proposta', 'Qualificado']
     values = [total, positivos, contatos_wp, propostas, qualificados]
 
-    fig = go.Figure(go.Funnel(
-        y=steps,
-        x=values,
-        textinfo='value+percent previous',
-        marker={'color': ['#4a90e2', '#5dade2', '#f5b041', '#f4a261', '#58d68d']}
-    ))
-    fig.update_layout(margin=dict(l=20, r=20, t=30, b=20))
-    return fig
+    return figure_dict([{
+        'type': 'funnel',
+        'y': steps,
+        'x': values,
+        'textinfo': 'value+percent previous',
+        'marker': {'color': ['#4a90e2', '#5dade2', '#f5b041', '#f4a261', '#58d68d']}
+    }], margin=dict(l=20, r=20, t=30, b=20))
 
 
 @app.callback(
     Output('reasons-bar', 'figure'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_reasons_bar(start_date, end_date, n_clicks, period_store):
+@cached_view('reasons-bar')
+def update_reasons_bar(start_date, end_date, data_version, period_store):
+    ds = current_dataset()
+    df = ds.df
     # Extrair motivos da coluna 'Histórico' e categorizar automaticamente
     # Priorizar period-store
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
@@ -1063,48 +2654,22 @@ def update_reasons_bar(start_date, end_date, n_clicks, period_store):
                 return {}
 
     if 'DataReferencia' in df.columns:
-        d = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
+        d = period_slice(df, start, end)
     else:
-        d = df.copy()
+        d = df
 
     # verificar coluna essencial 'Histórico'
     # normalizar variantes de Histórico
-    hist_col = find_col(d, ['Histórico', 'Historico', 'Historico '])
+    hist_col = ds.schema['historico']
     if not hist_col:
-        fig = px.bar(x=[1], y=['Sem dados'], orientation='h').update_layout(title='Coluna "Histórico" não encontrada')
-        fig.update_layout(annotations=[dict(text=f"Colunas: {df.columns.tolist()}", xref='paper', yref='paper', x=0, y=-0.2, showarrow=False)])
-        return fig
+        return bar_figure([1], ['Sem dados'], 'x', 'y', orientation='h', title={'text': 'Coluna "Histórico" não encontrada'},
+                          annotations=[dict(text=f"Colunas: {df.columns.tolist()}", xref='paper', yref='paper', x=0, y=-0.2, showarrow=False)])
 
-    raw = d[hist_col].astype(str).fillna('').str.lower()
+    # motivos já classificados na ingestão (coluna _motivo, ver MotivoClassifier)
+    counts = count_by(d['_motivo']).head(10)
 
-    raw = d['Histórico'].astype(str).fillna('').str.lower()
-
-    # regras simples de categorização (padrões comuns)
-    categories = {
-        'não tem sistema': ['não tem sistema', 'nao tem sistema', 'sem sistema'],
-        'sem interesse': ['sem interesse', 'não interessado', 'nao interessado', 'sem interesse no momento'],
-        'responsável ausente': ['responsável ausente', 'responsavel ausente', 'sem responsável', 'sem responsavel'],
-        'preço': ['preço', 'preco', 'caro', 'muito caro']
-    }
-
-    def classify(text):
-        for cat, kws in categories.items():
-            for kw in kws:
-                if kw in text:
-                    return cat
-        # fallback: tentar tokens comuns
-        if 'nao' in text or 'não' in text:
-            return 'sem interesse'
-        if text.strip() == '':
-            return 'sem resposta'
-        return 'outros'
-
-    cats = raw.apply(classify)
-    counts = cats.value_counts().head(10)
-
-    fig = px.bar(x=counts.values, y=counts.index, orientation='h', labels={'x': 'Contagem', 'y': 'Motivo'})
-    fig.update_layout(margin=dict(l=80, r=20, t=20, b=20))
-    return fig
+    return bar_figure(counts.tolist(), counts.index.tolist(), 'Contagem', 'Motivo', orientation='h',
+                      margin=dict(l=80, r=20, t=20, b=20))
 
 
 # -----------------
@@ -1114,9 +2679,12 @@ def update_reasons_bar(start_date, end_date, n_clicks, period_store):
 
 @app.callback(
     Output('performance-kpis', 'children'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_performance_kpis(start_date, end_date, n_clicks, period_store):
+@cached_view('performance-kpis')
+def update_performance_kpis(start_date, end_date, data_version, period_store):
+    ds = current_dataset()
+    df = ds.df
     # KPIs resumidos por consultora (nº leads, % positivos, % propostas, % qualificados, % atrasados)
     # Priorizar period-store
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
@@ -1148,38 +2716,12 @@ def update_performance_kpis(start_date, end_date, n_clicks, period_store):
             render_data_debug_sample()
         ], style={'color': 'darkred', 'textAlign': 'center'})
 
-    if 'DataReferencia' in df.columns:
-        d = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
-    else:
-        d = df.copy()
-
-    if 'Consultora' not in d.columns or d.empty:
+    kpis = consultora_kpis(start, end)
+    if kpis.empty:
         return html.Div('Nenhum dado por consultora disponível')
 
-    group = d.groupby('Consultora')
-    resumo = []
-    today = datetime.now().date()
-    for name, g in group:
-        total = len(g)
-        positivos = len(g[g['Positivo'] == 'Sim']) if 'Positivo' in g.columns else 0
-        propostas = len(g[g['Proposta'] == 'Sim']) if 'Proposta' in g.columns else 0
-        qualificados = len(g[g['Qualificado'].astype(str).str.contains('sim', case=False, na=False)]) if 'Qualificado' in g.columns else 0
-        atrasos = 0
-        if 'Positivo' in g.columns and 'DataReferencia' in g.columns:
-            atraso_df = g[g['Positivo'] == 'Sim'].copy()
-            atraso_df['DiasAtraso'] = atraso_df['DataReferencia'].apply(lambda x: (today - x.date()).days if pd.notnull(x) else None)
-            atrasos = len(atraso_df[atraso_df['DiasAtraso'] >= 7])
-
-        resumo.append({
-            'Consultora': name,
-            'Leads': total,
-            '% Positivos': (positivos/total*100) if total else 0,
-            '% Propostas': (propostas/total*100) if total else 0,
-            '% Qualificados': (qualificados/total*100) if total else 0,
-            '% Atrasados': (atrasos/total*100) if total else 0
-        })
-
-    resumo_df = pd.DataFrame(resumo).sort_values('Leads', ascending=False)
+    resumo_df = kpis[['Consultora', 'Leads', '% Positivos', '% Propostas', '% Qualificados', '% Atrasados']]
+    resumo_df = resumo_df.sort_values('Leads', ascending=False)
 
     # Renderizar uma tabela simples com os KPIs
     return dash_table.DataTable(
@@ -1192,9 +2734,12 @@ def update_performance_kpis(start_date, end_date, n_clicks, period_store):
 
 @app.callback(
     Output('consultora-comparative-bar', 'figure'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_consultora_comparative(start_date, end_date, n_clicks, period_store):
+@cached_view('consultora-comparative')
+def update_consultora_comparative(start_date, end_date, data_version, period_store):
+    ds = current_dataset()
+    df = ds.df
     # Priorizar period-store
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
         try:
@@ -1223,31 +2768,12 @@ def update_consultora_comparative(start_date, end_date, n_clicks, period_store):
         fig.update_layout(title='Coluna "Consultora" não encontrada')
         return fig
 
-    if 'DataReferencia' in df.columns:
-        d = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
-    else:
-        d = df.copy()
-
-    if 'Consultora' not in d.columns or d.empty:
+    kpis = consultora_kpis(start, end)
+    if kpis.empty:
         return {}
 
-    group = d.groupby('Consultora')
-    data = []
-    for name, g in group:
-        total = len(g)
-        positivos = len(g[g['Positivo'] == 'Sim']) if 'Positivo' in g.columns else 0
-        propostas = len(g[g['Proposta'] == 'Sim']) if 'Proposta' in g.columns else 0
-        qualificados = len(g[g['Qualificado'].astype(str).str.contains('sim', case=False, na=False)]) if 'Qualificado' in g.columns else 0
-        atrasos = 0
-        today = datetime.now().date()
-        if 'Positivo' in g.columns and 'DataReferencia' in g.columns:
-            atraso_df = g[g['Positivo'] == 'Sim'].copy()
-            atraso_df['DiasAtraso'] = atraso_df['DataReferencia'].apply(lambda x: (today - x.date()).days if pd.notnull(x) else None)
-            atrasos = len(atraso_df[atraso_df['DiasAtraso'] >= 7])
-
-        data.append({'Consultora': name, 'Leads': total, 'PctPositivos': positivos/total*100 if total else 0, 'PctPropostas': propostas/total*100 if total else 0, 'PctQualificados': qualificados/total*100 if total else 0, 'PctAtrasados': atrasos/total*100 if total else 0})
-
-    plot_df = pd.DataFrame(data)
+    plot_df = kpis.rename(columns={'% Positivos': 'PctPositivos', '% Propostas': 'PctPropostas',
+                                   '% Qualificados': 'PctQualificados', '% Atrasados': 'PctAtrasados'})
     # criar gráfico agrupado com barras por consultora
     fig = px.bar(plot_df, x='Consultora', y=['Leads', 'PctPositivos', 'PctPropostas', 'PctQualificados', 'PctAtrasados'], barmode='group')
     fig.update_layout(xaxis={'categoryorder':'total descending'}, margin=dict(l=20, r=20, t=30, b=80))
@@ -1256,9 +2782,12 @@ def update_consultora_comparative(start_date, end_date, n_clicks, period_store):
 
 @app.callback(
     Output('time-series-metrics', 'figure'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_time_series(start_date, end_date, n_clicks, period_store):
+@cached_view('time-series')
+def update_time_series(start_date, end_date, data_version, period_store):
+    ds = current_dataset()
+    df = ds.df
     # evolução diária de leads, propostas, qualificados
     # Priorizar period-store
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
@@ -1282,34 +2811,41 @@ def update_time_series(start_date, end_date, n_clicks, period_store):
             except Exception:
                 return {}
 
+    resolution = TimeSeriesRollups.resolution(start, end)
     if 'DataReferencia' in df.columns:
-        d = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
+        x, values = ds.rollups.series(start, end, resolution)
     else:
-        d = df.copy()
+        x = []
 
-    if d.empty or 'DataReferencia' not in d.columns:
+    if len(x) == 0:
         fig = go.Figure()
         fig.add_annotation(text='Coluna "DataReferencia" ausente ou sem dados para série temporal', xref='paper', yref='paper', showarrow=False)
         fig.update_layout(title='DataReferencia ausente ou sem dados')
         return fig
 
-    d['date'] = d['DataReferencia'].dt.date
-    daily = d.groupby('date').agg(
-        leads=('Empresa', 'count') if 'Empresa' in d.columns else ('DataReferencia', 'count'),
-        propostas=('Proposta', lambda x: (x=='Sim').sum()) if 'Proposta' in d.columns else ('DataReferencia', 'count'),
-        qualificados=('Qualificado', lambda x: x.astype(str).str.contains('sim', case=False, na=False).sum()) if 'Qualificado' in d.columns else ('DataReferencia', 'count')
-    ).reset_index()
-
-    fig = px.line(daily, x='date', y=['leads', 'propostas', 'qualificados'])
-    fig.update_layout(xaxis_title='Data', yaxis_title='Contagem', legend_title='Métrica', margin=dict(l=20, r=20, t=30, b=20))
+    # leads = registros com Empresa; sem a coluna da métrica, conta todos os registros
+    metrics = {
+        'leads': M_COM_EMPRESA if 'Empresa' in df.columns else M_TOTAL,
+        'propostas': M_PROPOSTA if 'Proposta' in df.columns else M_TOTAL,
+        'qualificados': M_QUALIFICADO + QUALIFICADO_SIM if 'Qualificado' in df.columns else M_TOTAL,
+    }
+    x_days = x.astype('int64')
+    fig = go.Figure()
+    for name, metric in metrics.items():
+        keep = lttb_indices(x_days, values[:, metric], SERIES_MAX_POINTS)
+        fig.add_trace(go.Scatter(x=x[keep], y=values[keep, metric], name=name, mode='lines'))
+    labels = {'D': 'Data', 'W': 'Semana', 'M': 'Mês'}
+    fig.update_layout(xaxis_title=labels[resolution], yaxis_title='Contagem', legend_title='Métrica', margin=dict(l=20, r=20, t=30, b=20))
     return fig
 
 
 @app.callback(
     Output('avg-time-steps', 'children'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_avg_time_steps(start_date, end_date, n_clicks, period_store):
+@cached_view('avg-time-steps')
+def update_avg_time_steps(start_date, end_date, data_version, period_store):
+    df = current_dataset().df
     # calcular tempo médio entre etapas estimado por datas nos campos disponíveis
     # pressupõe existência de colunas com timestamps ou DataReferencia para fases; se não existir, aproximar com DataReferencia
     # Priorizar period-store
@@ -1338,7 +2874,7 @@ def update_avg_time_steps(start_date, end_date, n_clicks, period_store):
     if 'DataReferencia' not in df.columns:
         return html.Div('Dados insuficientes para calcular tempos médios')
 
-    d = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
+    d = period_slice(df, start, end).copy()
 
     # Tentativa: se existirem colunas 'DataContato', 'DataProposta', 'DataQualificado' usar elas; caso contrário, não calcular
     date_cols = [c for c in ['DataContato', 'DataProposta', 'DataQualificado'] if c in d.columns]
@@ -1374,9 +2910,11 @@ def update_avg_time_steps(start_date, end_date, n_clicks, period_store):
 
 @app.callback(
     Output('ranking-consultoras', 'figure'),
-    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('refresh-data', 'n_clicks'), Input('period-store', 'data')]
+    [Input('date-picker-start', 'date'), Input('date-picker-end', 'date'), Input('dataset-version', 'data'), Input('period-store', 'data')]
 )
-def update_ranking_consultoras(start_date, end_date, n_clicks, period_store):
+@cached_view('ranking-consultoras')
+def update_ranking_consultoras(start_date, end_date, data_version, period_store):
+    df = current_dataset().df
     # Priorizar period-store
     if period_store and isinstance(period_store, dict) and period_store.get('start') and period_store.get('end'):
         try:
@@ -1400,200 +2938,256 @@ def update_ranking_consultoras(start_date, end_date, n_clicks, period_store):
                 return {}
 
     if 'Consultora' not in df.columns:
-        fig = go.Figure()
-        fig.add_annotation(text='Coluna "Consultora" ausente para ranking', xref='paper', yref='paper', showarrow=False)
-        fig.update_layout(title='Consultora ausente')
-        return fig
-
-    if 'DataReferencia' in df.columns:
-        d = df[(df['DataReferencia'] >= start) & (df['DataReferencia'] <= end)].copy()
-    else:
-        d = df.copy()
-
-    if 'Consultora' not in d.columns:
-        return {}
-
-    group = d.groupby('Consultora')
-    ranking = []
-    for name, g in group:
-        total = len(g)
-        qualificados = len(g[g['Qualificado'].astype(str).str.contains('sim', case=False, na=False)]) if 'Qualificado' in g.columns else 0
-        conv_rate = (qualificados/total*100) if total else 0
-        ranking.append({'Consultora': name, 'Taxa Conversão': conv_rate})
-
-    rdf = pd.DataFrame(ranking).sort_values('Taxa Conversão', ascending=False)
-    fig = px.bar(rdf, x='Consultora', y='Taxa Conversão')
-    fig.update_layout(margin=dict(l=20, r=20, t=20, b=80))
-    return fig
-
-# Callback para cards de atraso por consultora
+        return message_figure('Coluna "Consultora" ausente para ranking', 'Consultora ausente')
+
+    kpis = consultora_kpis(start, end)
+    rdf = kpis[['Consultora', '% Qualificados']].sort_values('% Qualificados', ascending=False)
+    return bar_figure(rdf['Consultora'].tolist(), rdf['% Qualificados'].tolist(), 'Consultora', 'Taxa Conversão',
+                      margin=dict(l=20, r=20, t=20, b=80))
+
+# Paleta de cores pastéis (tons claros) aplicada aos cards de atraso ciclicamente, pela posição
+OVERDUE_CARD_PALETTE = [
+    '#FDEBD0',  # pêssego claro
+    '#E8F8F5',  # menta clara
+    '#F6EBF6',  # lavanda clara
+    '#FEF9E7',  # amarelo suave
+    '#E8F6FF',  # azul claro
+    '#FFF0F5',  # rosa claro
+]
+
+
+# Callback para cards de atraso por consultora: esqueleto fixo por versão, e a cada mudança
+# de dias só os números, a ordem e as cores que mudaram (ver render_cards)
 @app.callback(
     Output('overdue-cards', 'children'),
-    [Input('days-overdue-config', 'value'), Input('refresh-data', 'n_clicks'), Input('tabs', 'value'), Input('selected-consultora', 'data')]
+    Output('overdue-cards-state', 'data'),
+    [Input('days-overdue-config', 'value'), Input('dataset-version', 'data'), Input('tabs', 'value')],
+    # a seleção só define o destaque inicial; trocar de consultora muda a classe no navegador
+    [State('selected-consultora', 'data'), State('overdue-cards-state', 'data')]
 )
-def update_overdue_cards(days_config, n_clicks, active_tab, selected_consultora):
-    if not days_config:
-        return html.Div()
-
+def update_overdue_cards(days_config, data_version, active_tab, selected_consultora, cards_state):
     # Só calcular quando a aba de atrasos estiver ativa
-    if active_tab != 'tab-2':
-        return html.Div()
-
-    today = datetime.now().date()
-
-    # Filtrar contatos em atraso
-    if 'Positivo' in df.columns and 'DataReferencia' in df.columns:
-        overdue_df = df[df['Positivo'] == 'Sim'].copy()
-        overdue_df['dias_atraso'] = overdue_df['DataReferencia'].apply(lambda x: (today - x.date()).days if pd.notnull(x) else None)
-        overdue_df = overdue_df[overdue_df['dias_atraso'] >= days_config]
-    else:
-        overdue_df = pd.DataFrame()
-
-    # Contar por consultora
-    if 'Consultora' in overdue_df.columns and not overdue_df.empty:
-        overdue_by_consultora = overdue_df['Consultora'].value_counts()
-    else:
-        overdue_by_consultora = pd.Series()
-
-    # Paleta de cores pastéis (tons claros) para aplicar aos cards ciclicamente
-    pastel_palette = [
-        '#FDEBD0',  # pêssego claro
-        '#E8F8F5',  # menta clara
-        '#F6EBF6',  # lavanda clara
-        '#FEF9E7',  # amarelo suave
-        '#E8F6FF',  # azul claro
-        '#FFF0F5',  # rosa claro
-    ]
-
+    if not days_config or active_tab != 'tab-2':
+        return html.Div(), None
+    ds = current_dataset()
+    consultoras = current_overdue(ds).consultoras or []
+    paths = []
+    for i in range(len(consultoras)):
+        card = ('props', 'children', i, 'props', 'children', 0)
+        paths += [card + CARD_COUNT_PATH, ('props', 'children', i, 'props', 'style', 'order'),
+                  ('props', 'children', i, 'props', 'style', 'backgroundColor'),
+                  ('props', 'children', i, 'props', 'style', 'display')]
+    return render_cards(cards_state, ds.content_hash, paths, overdue_card_values(days_config),
+                        lambda: build_overdue_skeleton(consultoras, selected_consultora))
+
+
+@cached_view('overdue-cards')
+def overdue_card_values(days_config):
+    """Para cada consultora: atrasados, posição (maior atraso primeiro), cor pela posição e
+    visibilidade (só quem tem atrasados)."""
+    counts = current_overdue(current_dataset()).counts(days_config)
+    values = []
+    if counts is None:
+        return values
+    for count, position in zip(counts.tolist(), ranking_positions(counts).tolist()):
+        values += [f"{count}", position, OVERDUE_CARD_PALETTE[position % len(OVERDUE_CARD_PALETTE)],
+                   'inline-block' if count > 0 else 'none']
+    return values
+
+
+def build_overdue_skeleton(consultoras, selected_consultora):
+    """Um card (botão) por consultora; números, ordem, cor e visibilidade vêm de
+    overdue_card_values."""
     cards = []
-    for idx, (consultora, count) in enumerate(overdue_by_consultora.items()):
+    for consultora in consultoras:
         card_id = {'type': 'overdue-card', 'index': str(consultora)}
-        # cor de fundo baseada no índice da consultora
-        bg_color = pastel_palette[idx % len(pastel_palette)]
 
         # estilo base
-        base_style = {'backgroundColor': bg_color, 'padding': '16px', 'borderRadius': '5px',
-                      'margin': '10px', 'width': '200px', 'display': 'inline-block', 'border': '1px solid transparent', 'cursor': 'pointer'}
+        card_style = {'padding': '16px', 'borderRadius': '5px', 'margin': '10px', 'width': '200px',
+                      'border': '1px solid transparent', 'cursor': 'pointer'}
 
-        # se a consultora estiver selecionada, aplicar destaque (override)
+        # destaque da consultora selecionada: classe CSS (assets/leads.css)
+        class_name = 'overdue-card'
         if selected_consultora and str(consultora) == str(selected_consultora):
-            highlight_style = base_style.copy()
-            highlight_style.update({'backgroundColor': '#e8f4ff', 'border': '2px solid #4a90e2', 'boxShadow': '0 4px 8px rgba(74,144,226,0.15)'})
-            card_style = highlight_style
-        else:
-            card_style = base_style
+            class_name += ' overdue-card-selected'
 
         cards.append(
             html.Button([
                 html.Div([
-                    html.H4(f"{count}", style={'margin': '0', 'fontSize': '2em', 'color': 'black'}),
+                    html.H4("", style={'margin': '0', 'fontSize': '2em', 'color': 'black'}),
                     html.P(f"{consultora}", style={'margin': '0', 'fontSize': '2em', 'color': 'black'}),
                     #html.P("em atraso", style={'margin': '0', 'fontSize': '0.8em'})
                 ], style={'textAlign': 'center'})
             ],
             id=card_id,
             n_clicks=0,
+            className=class_name,
             style=card_style)
         )
 
     return html.Div(cards, style={'display': 'flex', 'justifyContent': 'center', 'flexWrap': 'wrap', 'gap': '10px'})
 
-# Callback para tabela de contatos em atraso
+# Callback para tabela de contatos em atraso: paginação, ordenação e filtro no servidor,
+# cada resposta leva só a página visível
 @app.callback(
-    Output('overdue-table', 'children'),
-    [Input('days-overdue-config', 'value'), Input('refresh-data', 'n_clicks'), Input('tabs', 'value'), Input('selected-consultora', 'data')]
+    Output('overdue-datatable', 'data'),
+    Output('overdue-datatable', 'columns'),
+    Output('overdue-datatable', 'page_count'),
+    Output('overdue-datatable', 'page_current'),
+    [Input('days-overdue-config', 'value'), Input('dataset-version', 'data'), Input('tabs', 'value'),
+     Input('selected-consultora', 'data'), Input('overdue-datatable', 'page_current'),
+     Input('overdue-datatable', 'page_size'), Input('overdue-datatable', 'sort_by'),
+     Input('overdue-datatable', 'filter_query')]
 )
-def update_overdue_table(days_config, n_clicks, active_tab, selected_consultora):
-    if not days_config:
-        return html.Div()
+def update_overdue_table(days_config, data_version, active_tab, selected_consultora,
+                         page_current, page_size, sort_by, filter_query):
+    # qualquer mudança que não seja troca de página volta para a primeira página
+    if 'overdue-datatable.page_current' not in dash.ctx.triggered_prop_ids:
+        page_current = 0
+    return overdue_table_page(days_config, active_tab, selected_consultora, filter_query, sort_by,
+                              page_current, page_size)
+
+
+OVERDUE_COLUMNS = ['DiasAtraso', 'Empresa', 'Consultora', 'Histórico']
+
+# parte do filter_query da DataTable: {coluna} operador valor (ver parse_filter_query)
+FILTER_PART_RE = re.compile(r'^\{(?P<column>[^}]+)\}\s+(?P<op>\S+)\s*(?P<value>.*)$')
+FILTER_OPERATORS = {'=': '=', 'eq': '=', '!=': '!=', 'ne': '!=', '<': '<', 'lt': '<', '<=': '<=', 'le': '<=',
+                    '>': '>', 'gt': '>', '>=': '>=', 'ge': '>=', 'contains': 'contains',
+                    'datestartswith': 'datestartswith'}
+
+
+def parse_filter_query(query):
+    """Converte o filter_query da DataTable (ex.: '{DiasAtraso} >= 30 && {Empresa} icontains abc')
+    em [(coluna, operador, valor, sensível a maiúsculas)]. Operadores com prefixo 'i'/'s'
+    escolhem a comparação sem/com distinção de maiúsculas (padrão: sem). Partes não
+    reconhecidas (ex.: 'is blank', '||') são ignoradas."""
+    parts = []
+    for part in (query or '').split(' && '):
+        match = FILTER_PART_RE.match(part.strip())
+        if not match:
+            continue
+        op, sensitive = match.group('op'), False
+        if op not in FILTER_OPERATORS and op[:1] in ('i', 's') and op[1:] in FILTER_OPERATORS:
+            op, sensitive = op[1:], op[0] == 's'
+        if op not in FILTER_OPERATORS:
+            continue
+        value = match.group('value').strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        parts.append((match.group('column'), FILTER_OPERATORS[op], value, sensitive))
+    return parts
+
+
+def filter_mask(values, op, value, sensitive):
+    """Máscara booleana de `values` (Series) para uma condição de parse_filter_query."""
+    if op in ('contains', 'datestartswith') or not pd.api.types.is_numeric_dtype(values):
+        text = values.astype('string')
+        if not sensitive:
+            text, value = text.str.lower(), value.lower()
+        if op == 'contains':
+            mask = text.str.contains(value, regex=False)
+        elif op == 'datestartswith':
+            mask = text.str.startswith(value)
+        else:
+            mask = {'=': text == value, '!=': text != value, '<': text < value, '<=': text <= value,
+                    '>': text > value, '>=': text >= value}[op]
+        return mask.fillna(False).to_numpy(dtype=bool)
+    try:
+        number = float(value)
+    except ValueError:
+        return np.zeros(len(values), dtype=bool)
+    numbers = values.to_numpy()
+    return {'=': numbers == number, '!=': numbers != number, '<': numbers < number, '<=': numbers <= number,
+            '>': numbers > number, '>=': numbers >= number}[op]
 
-    # Só calcular quando a aba de atrasos estiver ativa
-    if active_tab != 'tab-2':
-        return html.Div()
 
-    today = datetime.now().date()
+@cached_view('overdue-table')
+def overdue_table_page(days_config, active_tab, selected_consultora, filter_query, sort_by, page_current, page_size):
+    """Uma página da tabela de atrasos: (data, columns, page_count, page_current).
 
-    # Filtrar contatos em atraso
-    if 'Positivo' in df.columns and 'DataReferencia' in df.columns:
-        overdue_df = df[df['Positivo'] == 'Sim'].copy()
-        overdue_df['DiasAtraso'] = overdue_df['DataReferencia'].apply(lambda x: (today - x.date()).days if pd.notnull(x) else None)
-        overdue_df = overdue_df[overdue_df['DiasAtraso'] >= days_config]
-    else:
-        overdue_df = pd.DataFrame()
+    Trabalha sobre o OverdueIndex: as linhas com atraso >= N dias são um prefixo do índice,
+    a ordenação por coluna é uma permutação calculada uma vez por versão/dia e os filtros
+    são máscaras sobre esse prefixo; só as linhas da página são montadas em registros.
+    """
+    ds = current_dataset()
+    df = ds.df
+    # Só calcular quando a aba de atrasos estiver ativa
+    if not days_config or active_tab != 'tab-2':
+        return [], [], 1, 0
+    if 'Positivo' not in df.columns or 'DataReferencia' not in df.columns:
+        return [{'Aviso': 'Nenhuma coluna disponível'}], [{'name': 'Aviso', 'id': 'Aviso'}], 1, 0
+
+    index = current_overdue(ds)
+    colunas = [col for col in OVERDUE_COLUMNS if col == 'DiasAtraso' or col in df.columns]
+    limit = index.count(days_config)
+    keep = np.ones(limit, dtype=bool)
 
     # Se uma consultora foi selecionada, filtrar somente por ela
     if selected_consultora:
-        if 'Consultora' in overdue_df.columns:
-            overdue_df = overdue_df[overdue_df['Consultora'].astype(str) == str(selected_consultora)]
+        if index.consultoras is not None:
+            codes = [i for i, name in enumerate(index.consultoras) if str(name) == str(selected_consultora)]
+            keep &= np.isin(index.cons_codes[:limit], codes)
         else:
-            overdue_df = pd.DataFrame()
-
-    # Selecionar e ordenar colunas
-    colunas_disponiveis = ['DiasAtraso', 'Empresa', 'Consultora', 'Histórico']
-    colunas_existentes = [col for col in colunas_disponiveis if col in overdue_df.columns]
-
-    if colunas_existentes and not overdue_df.empty:
-        table_df = overdue_df[colunas_existentes].copy()
-        table_df = table_df.sort_values('DiasAtraso', ascending=False) if 'DiasAtraso' in table_df.columns else table_df
-    else:
-        table_df = pd.DataFrame({'Aviso': ['Nenhuma coluna disponível']})
-
-    return dash_table.DataTable(
-        data=table_df.to_dict('records'),
-        columns=[{"name": col, "id": col} for col in table_df.columns],
-        style_cell={'textAlign': 'left', 'whiteSpace': 'normal', 'height': 'auto'},
-        style_header={'backgroundColor': 'lightcoral', 'fontWeight': 'bold'},
-        style_data_conditional=[
-            {
-                'if': {'filter_query': '{DiasAtraso} >= 15'},
-                'backgroundColor': '#ffcccc',
-            },
-            {
-                'if': {'filter_query': '{DiasAtraso} >= 30'},
-                'backgroundColor': '#ff9999',
-            }
-        ]
-    )
-
-
-@app.callback(
+            keep[:] = False
+    for column, op, value, sensitive in parse_filter_query(filter_query):
+        if column in colunas:
+            keep &= filter_mask(index.column(df, column).iloc[:limit], op, value, sensitive)
+
+    # Ordem padrão: do maior para o menor atraso (a própria ordem do índice)
+    order = np.arange(limit)
+    if sort_by and sort_by[0].get('column_id') in colunas:
+        order = index.order(df, sort_by[0]['column_id'], sort_by[0].get('direction') == 'desc')
+        order = order[order < limit]
+    order = order[keep[order]]
+
+    page_size = page_size or OVERDUE_PAGE_SIZE
+    page_count = max(1, -(-len(order) // page_size))
+    page_current = min(max(int(page_current or 0), 0), page_count - 1)
+    selected = order[page_current * page_size:(page_current + 1) * page_size]
+    table_df = df.take(index.rows[selected])[[col for col in colunas if col != 'DiasAtraso']]
+    table_df.insert(0, 'DiasAtraso', index.dias_atraso[selected])
+    # DiasAtraso numérico: número digitado no filtro vira 'i=' (igualdade), não 'icontains'
+    columns = [{"name": col, "id": col, **({"type": "numeric"} if col == 'DiasAtraso' else {})} for col in colunas]
+    return table_df.to_dict('records'), columns, page_count, page_current
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='leads', function_name='selectConsultora'),
     Output('selected-consultora', 'data'),
+    Output({'type': 'overdue-card', 'index': ALL}, 'className'),
     [Input({'type': 'overdue-card', 'index': ALL}, 'n_clicks')],
-    [State('selected-consultora', 'data')],
+    [State('selected-consultora', 'data'), State({'type': 'overdue-card', 'index': ALL}, 'id')],
     prevent_initial_call=True
 )
-def select_consultora(n_clicks_list, current_selected):
-    # identificar qual botão disparou
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        raise dash.exceptions.PreventUpdate
-    triggered = ctx.triggered[0]['prop_id'].split('.')[0]
-    try:
-        triggered_id = json.loads(triggered)
-        name = triggered_id.get('index', '')
-    except Exception:
-        raise dash.exceptions.PreventUpdate
 
-    # toggle: se clicar na mesma consultora desmarca
-    if current_selected == name:
-        return ''
-    return name
-
-# Callback para atualizar dados manualmente
+# Callback para atualizar dados manualmente: apenas agenda a atualização em segundo plano
 @app.callback(
-    Output('last-refresh', 'children'),
+    Output('last-refresh', 'children', allow_duplicate=True),
     Input('refresh-data', 'n_clicks'),
     prevent_initial_call=True
 )
 def refresh_data(n_clicks):
     if n_clicks > 0:
-        # Recarregar dados do Google Sheets
-        global df
-        df = get_google_sheets_data()
+        refresher.request_refresh()
         ts = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-        return f"Última atualização: {ts}"
+        return f"Atualização solicitada em {ts}..."
     raise dash.exceptions.PreventUpdate
 
+
+# Verificação de nova versão no navegador: consulta /_leads/version e só altera
+# dataset-version (que dispara os callbacks das abas) quando o hash muda
+app.clientside_callback(
+    ClientsideFunction(namespace='leads', function_name='pollVersion'),
+    Output('dataset-version', 'data'),
+    Output('last-refresh', 'children'),
+    Input('dataset-poll', 'n_intervals'),
+    State('dataset-version', 'data'),
+    State('last-refresh', 'children')
+)
+
 if __name__ == '__main__':
+    # Atualização dos dados em segundo plano (primeira coleta logo após iniciar)
+    refresher.start(refresh_now=True)
     # Rodar o servidor em host e porta especificados
     app.run(host='0.0.0.0', port=8555, debug=False, dev_tools_hot_reload=False, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,71 @@
+// Callbacks executados no navegador (app.clientside_callback em Leads.py): só
+// reformatam entradas, sem ida ao servidor (exceto pollVersion, que lê um JSON pequeno).
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    leads: {
+        // 'AAAA-MM-DD' (ou data/hora ISO do DatePicker) -> 'AAAA-MM-DD'; inválida -> null
+        _isoDate: function (value) {
+            var match = /^(\d{4}-\d{2}-\d{2})/.exec(value || '');
+            return match ? match[1] : null;
+        },
+
+        // Espelha as datas da aba Análise Geral no period-store (lido pelas outras abas)
+        syncPeriodStore: function (startDate, endDate) {
+            var leads = window.dash_clientside.leads;
+            return {start: leads._isoDate(startDate), end: leads._isoDate(endDate)};
+        },
+
+        // "Período: dd/mm/aaaa — dd/mm/aaaa" a partir do period-store
+        periodBadge: function (periodStore) {
+            if (!periodStore || !periodStore.start || !periodStore.end) {
+                return '';
+            }
+            var br = function (iso) {
+                var parts = iso.split('-');
+                return parts[2] + '/' + parts[1] + '/' + parts[0];
+            };
+            return {
+                namespace: 'dash_html_components',
+                type: 'Span',
+                props: {
+                    children: 'Período: ' + br(periodStore.start) + ' — ' + br(periodStore.end),
+                    style: {fontWeight: '600'}
+                }
+            };
+        },
+
+        // Clique num card de atraso: seleciona a consultora (ou desmarca se já estava
+        // selecionada) e troca a classe dos cards, sem redesenhá-los no servidor
+        selectConsultora: function (nClicks, currentSelected, cardIds) {
+            var ctx = window.dash_clientside.callback_context;
+            if (!ctx.triggered.length || !ctx.triggered[0].value) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            var propId = ctx.triggered[0].prop_id;
+            var name;
+            try {
+                name = JSON.parse(propId.slice(0, propId.lastIndexOf('.'))).index;
+            } catch (e) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            var selected = currentSelected === name ? '' : name;
+            var classes = cardIds.map(function (id) {
+                return id.index === selected ? 'overdue-card overdue-card-selected' : 'overdue-card';
+            });
+            return [selected, classes];
+        },
+
+        // Versão vigente dos dados (/_leads/version, 304 quando nada mudou): dataset-version
+        // só muda quando o hash muda, e é ele que dispara os callbacks das abas no servidor
+        pollVersion: function (nIntervals, currentVersion, currentText) {
+            var noUpdate = window.dash_clientside.no_update;
+            var config = JSON.parse(document.getElementById('_dash-config').textContent);
+            return fetch(config.requests_pathname_prefix + '_leads/version', {cache: 'no-cache', credentials: 'same-origin'})
+                .then(function (response) { return response.json(); })
+                .then(function (info) {
+                    return [info.version === currentVersion ? noUpdate : info.version,
+                            info.text === currentText ? noUpdate : info.text];
+                })
+                .catch(function () { return [noUpdate, noUpdate]; });
+        }
+    }
+});
@@ -1,5 +1,5 @@
 @echo off
-REM Runner para o app Dash (leads.py)
+REM Runner para o app Dash (serve.py: waitress quando instalado, senão o servidor do Dash)
 REM Ajuste o comando python para o executável desejado se necessário (ex.: C:\Python39\python.exe)
 cd /d "C:\Users\alex\Documents\Python\Leads"
-python leads.py
+python serve.py
@@ -0,0 +1,75 @@
+"""Servidor de produção do CSLeads.
+
+- Windows: waitress (um processo, várias threads).
+- Linux: gunicorn com LEADS_WORKERS processos de LEADS_THREADS threads. O Leads.py é
+  importado uma vez no processo mestre (preload), então os dados são carregados antes do
+  fork e compartilhados pelos workers (copy-on-write). Só um worker baixa a planilha; os
+  demais recarregam o snapshot gravado por ele (ver BackgroundRefresher em Leads.py).
+
+Sem waitress/gunicorn instalados, cai para o servidor de desenvolvimento do Dash.
+"""
+import gc
+import os
+
+HOST = os.environ.get('LEADS_HOST', '0.0.0.0')
+PORT = int(os.environ.get('LEADS_PORT', '8555'))
+WORKERS = int(os.environ.get('LEADS_WORKERS', str(min(4, os.cpu_count() or 1))))
+THREADS = int(os.environ.get('LEADS_THREADS', '8'))
+
+
+def run_waitress():
+    from waitress import serve
+    import Leads
+    print(f"waitress em {HOST}:{PORT} ({THREADS} threads)")
+    serve(Leads.get_server(), host=HOST, port=PORT, threads=THREADS)
+
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    if WORKERS > 1:
+        # lido na importação do Leads: coleta por um só worker e versões em cache/shared
+        os.environ.setdefault('LEADS_SHARED_STORE', '1')
+
+    def post_fork(server, worker):
+        # threads não sobrevivem ao fork: cada worker inicia a sua (uma só fará a coleta)
+        import Leads
+        Leads.refresher.start(refresh_now=True)
+
+    class LeadsApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{HOST}:{PORT}')
+            self.cfg.set('workers', WORKERS)
+            self.cfg.set('threads', THREADS)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('preload_app', True)
+            self.cfg.set('post_fork', post_fork)
+
+        def load(self):
+            import Leads
+            # objetos já carregados saem do GC para não serem copiados nos workers
+            gc.freeze()
+            return Leads.server
+
+    print(f"gunicorn em {HOST}:{PORT} ({WORKERS} workers x {THREADS} threads)")
+    LeadsApplication().run()
+
+
+def run_dev():
+    import Leads
+    print("Aviso: waitress/gunicorn não instalados; usando o servidor de desenvolvimento")
+    Leads.get_server()
+    Leads.app.run(host=HOST, port=PORT, debug=False, dev_tools_hot_reload=False, use_reloader=False)
+
+
+if __name__ == '__main__':
+    try:
+        if os.name == 'nt':
+            import waitress  # noqa: F401
+            runner = run_waitress
+        else:
+            import gunicorn  # noqa: F401
+            runner = run_gunicorn
+    except ImportError:
+        runner = run_dev
+    runner()
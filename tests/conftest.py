@@ -0,0 +1,34 @@
+"""Leads.py é importado com a planilha de exemplo tests/data/resumo.csv (LEADS_SOURCE=file)
+e um diretório de cache temporário, sem acesso à rede."""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_CSV = os.path.join(TESTS_DIR, 'data', 'resumo.csv')
+
+os.environ['LEADS_SOURCE'] = 'file'
+os.environ['LEADS_SOURCE_PATH'] = SAMPLE_CSV
+os.environ['LEADS_CACHE_DIR'] = tempfile.mkdtemp(prefix='leads-tests-')
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+
+@pytest.fixture
+def sample_rows():
+    """Linhas da planilha de exemplo como texto, para montar variações do export."""
+    return pd.read_csv(SAMPLE_CSV, dtype=str, keep_default_na=False)
+
+
+@pytest.fixture
+def sheet_frame():
+    """Converte linhas (DataFrame de texto) no DataFrame normalizado da ingestão."""
+    import Leads
+
+    def build(rows):
+        df = Leads.read_sheet_csv(rows.to_csv(index=False).encode('utf-8'))
+        df['_row_hash'] = Leads.compute_row_hash(df)
+        return df
+    return build
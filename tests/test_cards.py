@@ -0,0 +1,91 @@
+import json
+
+import dash
+import plotly
+import pytest
+
+import Leads
+
+FULL = ('2023-01-01', '2025-12-31')
+SEPTEMBER = ('2025-09-01', '2025-09-30')
+
+
+def summary(period):
+    ds, values, _ = Leads.analise_geral_period(*period)
+    return ds, Leads.summary_card_paths(len(ds.colors)), values
+
+
+def as_json(tree):
+    return json.loads(json.dumps(tree, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def filled_tree(ds, paths, values):
+    tree = Leads.build_summary_skeleton(ds)
+    for path, value in zip(paths, values):
+        Leads.tree_set(tree, path, value)
+    return as_json(tree)
+
+
+def patch_operations(patch):
+    return {tuple(op['location']): op['params']['value'] for op in patch.to_plotly_json()['operations']}
+
+
+def test_values_match_the_skeleton_paths():
+    ds, paths, values = summary(FULL)
+    assert ds is Leads.current_dataset()
+    assert len(values) == len(paths) > len(Leads.SUMMARY_COLUMNS) + 2
+    tree = Leads.build_summary_skeleton(ds)
+    for path in paths:
+        Leads.tree_set(tree, path, 0)
+
+
+def test_first_render_is_the_full_tree():
+    ds, paths, values = summary(FULL)
+    tree, state = Leads.render_cards(None, ds.content_hash, paths, values,
+                                     lambda: Leads.build_summary_skeleton(ds))
+    assert state['signature'] == ds.content_hash
+    assert as_json(tree) == filled_tree(ds, paths, values)
+
+
+def test_same_values_send_nothing():
+    ds, paths, values = summary(FULL)
+    _, state = Leads.render_cards(None, ds.content_hash, paths, values, lambda: Leads.build_summary_skeleton(ds))
+    assert Leads.render_cards(state, ds.content_hash, paths, values, pytest.fail) == (dash.no_update, dash.no_update)
+
+
+def test_patch_carries_only_changed_values():
+    ds, paths, values = summary(FULL)
+    _, new_values = summary(SEPTEMBER)[1:]
+    _, state = Leads.render_cards(None, ds.content_hash, paths, values, lambda: Leads.build_summary_skeleton(ds))
+    patch, new_state = Leads.render_cards(state, ds.content_hash, paths, new_values, pytest.fail)
+    assert isinstance(patch, dash.Patch)
+    expected = {path: new for path, old, new in zip(paths, values, new_values) if old != new}
+    assert expected and patch_operations(patch) == expected
+    # o Patch aplicado sobre a árvore anterior dá a árvore completa do novo período
+    tree = Leads.build_summary_skeleton(ds)
+    for path, value in zip(paths, values):
+        Leads.tree_set(tree, path, value)
+    for path, value in expected.items():
+        Leads.tree_set(tree, path, value)
+    assert as_json(tree) == filled_tree(ds, paths, new_values)
+    assert new_state == Leads.render_cards(None, ds.content_hash, paths, new_values,
+                                           lambda: Leads.build_summary_skeleton(ds))[1]
+
+
+def test_new_version_rebuilds_the_skeleton():
+    ds, paths, values = summary(FULL)
+    _, state = Leads.render_cards(None, ds.content_hash, paths, values, lambda: Leads.build_summary_skeleton(ds))
+    tree, new_state = Leads.render_cards(state, 'outra-versao', paths, values,
+                                         lambda: Leads.build_summary_skeleton(ds))
+    assert not isinstance(tree, dash.Patch)
+    assert new_state['signature'] == 'outra-versao'
+
+
+def test_long_texts_stay_in_the_state_as_digests():
+    ds, paths, values = summary(FULL)
+    _, state = Leads.render_cards(None, ds.content_hash, paths, values, lambda: Leads.build_summary_skeleton(ds))
+    for value, kept in zip(values, state['values']):
+        if isinstance(value, str) and len(value) > 32:
+            assert kept != value and len(kept) == 12
+        else:
+            assert kept == value
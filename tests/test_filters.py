@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+import Leads
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('{DiasAtraso} >= 30', [('DiasAtraso', '>=', '30', False)]),
+    ('{DiasAtraso} i= 12', [('DiasAtraso', '=', '12', False)]),
+    ('{Empresa} icontains abc && {Consultora} s= Ana',
+     [('Empresa', 'contains', 'abc', False), ('Consultora', '=', 'Ana', True)]),
+    ('{Empresa} scontains "O\\"Brien"', [('Empresa', 'contains', 'O"Brien', True)]),
+    ('{Histórico} ne \'sem resposta\'', [('Histórico', '!=', 'sem resposta', False)]),
+    ('{Empresa} is blank || {DiasAtraso} > 3', []),
+    ('{Empresa} xcontains abc', []),
+    ('', []),
+    (None, []),
+])
+def test_parse_filter_query(query, expected):
+    assert Leads.parse_filter_query(query) == expected
+
+
+TEXT = pd.Series(['Padaria Sol', 'SOLAR ltda', None, 'Mercado'], dtype=object)
+NUMBERS = pd.Series([3, 12, 30, 45])
+
+
+@pytest.mark.parametrize('values, op, value, sensitive, expected', [
+    (TEXT, 'contains', 'sol', False, [True, True, False, False]),
+    (TEXT, 'contains', 'Sol', True, [True, False, False, False]),
+    (TEXT, '=', 'mercado', False, [False, False, False, True]),
+    (TEXT, '!=', 'mercado', False, [True, True, False, False]),
+    (NUMBERS, '=', '12', False, [False, True, False, False]),
+    (NUMBERS, '>=', '30', False, [False, False, True, True]),
+    (NUMBERS, '<', '12.5', False, [True, True, False, False]),
+    (NUMBERS, '=', 'doze', False, [False, False, False, False]),
+    (NUMBERS, 'contains', '2', False, [False, True, False, False]),
+])
+def test_filter_mask(values, op, value, sensitive, expected):
+    mask = Leads.filter_mask(values, op, value, sensitive)
+    assert mask.dtype == bool
+    assert mask.tolist() == expected
+
+
+def page(filter_query, days=1):
+    data, columns, _, _ = Leads.overdue_table_page(days, 'tab-2', None, filter_query, None, 0, 1000)
+    return data, columns
+
+
+def test_overdue_table_numeric_filter():
+    data, columns = page('')
+    assert {'name': 'DiasAtraso', 'id': 'DiasAtraso', 'type': 'numeric'} in columns
+    dias = data[-1]['DiasAtraso']
+    # número digitado no filtro de uma coluna numérica chega como 'i=' (igualdade)
+    filtered, _ = page(f'{{DiasAtraso}} i= {dias}')
+    assert filtered == [row for row in data if row['DiasAtraso'] == dias]
+    filtered, _ = page(f'{{DiasAtraso}} > {dias}')
+    assert filtered == [row for row in data if row['DiasAtraso'] > dias]
+
+
+def test_overdue_table_text_filter_is_case_insensitive():
+    data, _ = page('')
+    term = data[0]['Empresa'][:4]
+    filtered, _ = page(f'{{Empresa}} icontains {term.upper()}')
+    expected = [row for row in data if term.lower() in row['Empresa'].lower()]
+    assert filtered == expected and expected
+
+
+def test_overdue_table_ignores_unknown_columns():
+    data, _ = page('')
+    assert page('{Inexistente} = x')[0] == data
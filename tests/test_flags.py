@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+import Leads
+
+
+def enrich(**columns):
+    return Leads.enrich_rows(pd.DataFrame(columns))
+
+
+def test_positivo_counts_exact_values_only():
+    df = enrich(Positivo=pd.Series(['Sim', 'Não', 'sim ', 'SIM', 'nao', '', None], dtype='category'))
+    assert df['_positivo'].tolist() == [1, 0, -1, -1, -1, -1, -1]
+
+
+def test_contato_and_proposta_ignore_case_and_spaces():
+    df = enrich(**{'Contato via wp': ['Sim', ' sim', 'Não', None], 'Proposta': ['SIM', 'não', '', 'Sim']})
+    assert df['_contato_wp'].tolist() == [True, True, False, False]
+    assert df['_proposta'].tolist() == [True, False, False, True]
+
+
+def test_qualificado_codes():
+    df = enrich(Qualificado=['Sim', 'sim ', 'Talvez', 'maybe', 'Não', None])
+    assert df['_qualificado'].tolist() == [Leads.QUALIFICADO_SIM, Leads.QUALIFICADO_SIM, Leads.QUALIFICADO_TALVEZ,
+                                           Leads.QUALIFICADO_TALVEZ, Leads.QUALIFICADO_NAO, Leads.QUALIFICADO_NAO]
+
+
+def test_missing_columns_give_neutral_flags():
+    df = enrich(Empresa=['a', 'b'])
+    assert df['_positivo'].tolist() == [-1, -1]
+    assert not df['_contato_wp'].any() and not df['_proposta'].any()
+    assert np.all(df['_qualificado'] == Leads.QUALIFICADO_NAO)
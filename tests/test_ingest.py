@@ -0,0 +1,38 @@
+import pandas as pd
+
+import Leads
+
+
+def test_incremental_matches_full_enrichment(sample_rows, sheet_frame):
+    prev = Leads.enrich_rows(sheet_frame(sample_rows))
+
+    rows = sample_rows.drop(index=[2]).copy()
+    rows.loc[4, 'Positivo'] = 'Não'
+    rows.loc[5, 'Histórico'] = 'achou caro'
+    inserted = rows.iloc[:1].copy()
+    inserted.iloc[0, 0] = '99'
+    inserted.loc[:, 'Qualificado'] = 'Talvez'
+    rows = pd.concat([rows.iloc[:3], inserted, rows.iloc[3:]])
+
+    incremental = Leads.apply_incremental_changes(prev, sheet_frame(rows))
+    full = Leads.enrich_rows(sheet_frame(rows))
+    pd.testing.assert_frame_equal(incremental, full)
+
+
+def test_incremental_reuses_unchanged_rows(sample_rows, sheet_frame, monkeypatch):
+    prev = Leads.enrich_rows(sheet_frame(sample_rows))
+    rows = sample_rows.copy()
+    rows.loc[0, 'Proposta'] = 'Sim'
+
+    enriched = []
+    original = Leads.enrich_rows
+    monkeypatch.setattr(Leads, 'enrich_rows', lambda df: enriched.append(len(df)) or original(df))
+    Leads.apply_incremental_changes(prev, sheet_frame(rows))
+    assert enriched == [1]
+
+
+def test_incremental_needs_unique_key(sample_rows, sheet_frame):
+    prev = Leads.enrich_rows(sheet_frame(sample_rows))
+    rows = sample_rows.copy()
+    rows.iloc[1, 0] = rows.iloc[0, 0]
+    assert Leads.apply_incremental_changes(prev, sheet_frame(rows)) is None
@@ -0,0 +1,46 @@
+import numpy as np
+
+import Leads
+
+
+def reference_lttb(x, y, n_out):
+    """LTTB escrito ponto a ponto, com os mesmos baldes de lttb_indices."""
+    n = len(y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    chosen, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nx, ny = np.mean(x[hi:edges[i + 2]]), np.mean(y[hi:edges[i + 2]])
+        else:
+            nx, ny = x[-1], y[-1]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - nx) * (y[j] - y[a]) - (x[a] - x[j]) * (ny - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        chosen.append(a)
+    return chosen + [n - 1]
+
+
+def test_short_series_is_kept_whole():
+    assert Leads.lttb_indices(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert Leads.lttb_indices(np.arange(5), np.arange(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_matches_reference_implementation():
+    rng = np.random.default_rng(7)
+    x = np.arange(1000, dtype=float)
+    y = np.cumsum(rng.normal(size=1000))
+    got = Leads.lttb_indices(x, y, 50)
+    assert got.tolist() == reference_lttb(x, y, 50)
+    assert len(got) == 50 and got[0] == 0 and got[-1] == 999
+    assert (np.diff(got) > 0).all()
+
+
+def test_keeps_isolated_peaks():
+    y = np.zeros(500)
+    y[123], y[377] = 50, -40
+    got = Leads.lttb_indices(np.arange(500), y, 20)
+    assert 123 in got and 377 in got
@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+
+import Leads
+
+RULES = Leads.load_motivo_rules(os.path.join(Leads.BASE_DIR, 'motivos.json'))
+
+
+def test_classifies_with_motivos_json():
+    # célula vazia (NaN) vira o texto 'nan' e cai em "outros", como no cálculo original
+    classifier = Leads.MotivoClassifier(RULES)
+    motivos = classifier.classify(pd.Series(['Sem interesse no momento', 'cliente NAO TEM SISTEMA', 'achou muito caro',
+                                             'responsavel ausente hoje', 'não atende', '  ', None, 'retornar amanhã']))
+    assert list(motivos) == ['sem interesse', 'não tem sistema', 'preço', 'responsável ausente', 'sem interesse',
+                             Leads.MOTIVO_SEM_RESPOSTA, Leads.MOTIVO_OUTROS, Leads.MOTIVO_OUTROS]
+
+
+def test_first_rule_in_file_order_wins():
+    classifier = Leads.MotivoClassifier(RULES)
+    # "não" (última regra) e "caro" (preço) no mesmo texto: vale a regra que vem antes
+    assert list(classifier.classify(pd.Series(['não gostou, achou caro']))) == ['preço']
+
+
+def test_known_texts_are_not_matched_again(monkeypatch):
+    classifier = Leads.MotivoClassifier(RULES)
+    first = classifier.classify(pd.Series(['achou caro', 'sem sistema']))
+
+    matched = []
+    original = classifier._match
+    monkeypatch.setattr(classifier, '_match', lambda text: matched.extend(text) or original(text))
+    again = classifier.classify(pd.Series(['sem sistema', 'Achou caro ', 'sem responsável']))
+    assert matched == ['sem responsável']
+    assert list(again) == ['não tem sistema', 'preço', 'responsável ausente']
+    assert list(first) == ['preço', 'não tem sistema']
+
+
+def test_known_texts_reset_above_limit():
+    classifier = Leads.MotivoClassifier(RULES)
+    classifier.max_known = 2
+    classifier.classify(pd.Series(['a', 'b']))
+    classifier.classify(pd.Series(['c']))
+    assert list(classifier._known.index) == ['c']
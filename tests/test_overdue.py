@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import Leads
+
+TODAY = pd.Timestamp('2025-10-01')
+
+
+@pytest.fixture
+def df(sample_rows, sheet_frame):
+    return Leads.sort_by_reference_date(Leads.enrich_rows(sheet_frame(sample_rows)))
+
+
+@pytest.fixture
+def index(df):
+    return Leads.OverdueIndex(df, TODAY.date())
+
+
+def naive(df, min_days):
+    positivos = df[(df['Positivo'] == 'Sim') & df['DataReferencia'].notna()]
+    atraso = (TODAY - positivos['DataReferencia']).dt.days
+    return positivos.assign(DiasAtraso=atraso)[atraso >= min_days]
+
+
+@pytest.mark.parametrize('min_days', [0, 3, 4, 7, 21, 30, 61, 62, 500])
+def test_count_and_frame_match_a_direct_filter(df, index, min_days):
+    expected = naive(df, min_days).sort_values('DiasAtraso', ascending=False, kind='stable')
+    assert index.count(min_days) == len(expected)
+    frame = index.frame(df, min_days)
+    assert frame['DiasAtraso'].tolist() == expected['DiasAtraso'].tolist()
+    assert frame['Empresa'].tolist() == expected['Empresa'].tolist()
+
+
+def test_counts_by_consultora(df, index):
+    expected = naive(df, 7)['Consultora'].value_counts()
+    got = index.by_consultora(7)
+    assert got.to_dict() == {k: v for k, v in expected.items() if v > 0}
+    assert (np.diff(got.to_numpy()) <= 0).all()
+
+
+def test_period_bounds(index):
+    assert index.count(0, start='2025-09-01', end='2025-09-27') == 2
+    assert index.count(7, start='2025-09-01') == 1
+
+
+def test_order_is_restricted_to_the_prefix(df, index):
+    limit = index.count(7)
+    order = index.order(df, 'Empresa', descending=False)
+    order = order[order < limit]
+    assert index.column(df, 'Empresa').take(order).tolist() == sorted(naive(df, 7)['Empresa'])
+    assert index.order(df, 'DiasAtraso', descending=True).tolist() == list(range(len(index.rows)))
@@ -0,0 +1,24 @@
+import Leads
+
+
+def test_aliases_are_renamed_to_canonical_names():
+    names = Leads.resolve_columns(['', ' Empresa', 'consultora ', 'Positivo?', 'Contato via WhatsApp',
+                                   'Historico', 'QUALIFICADO', 'NomeAba', 'Data de Referencia'])
+    assert names == ['numregistro', 'Empresa', 'Consultora', 'Positivo', 'Contato via wp',
+                     'Histórico', 'Qualificado', 'Nomeaba', 'DataReferencia']
+
+
+def test_partial_match_needs_a_whole_word():
+    names = Leads.resolve_columns(['Empresa', 'DataContato', 'ContatoOrigem', 'Proposta enviada em'])
+    assert names == ['Empresa', 'DataContato', 'ContatoOrigem', 'Proposta']
+
+
+def test_partial_match_skips_ambiguous_headers():
+    names = Leads.resolve_columns(['Empresa', 'Contato principal', 'Contato secundário'])
+    assert names == ['Empresa', 'Contato principal', 'Contato secundário']
+
+
+def test_schema_maps_missing_fields_to_none():
+    schema = Leads.build_schema(['Empresa', 'Positivo'])
+    assert schema['positivo'] == 'Positivo'
+    assert schema['historico'] is None
@@ -0,0 +1,56 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import Leads
+
+
+@pytest.fixture
+def ds(sample_rows, sheet_frame):
+    df = Leads.sort_by_reference_date(Leads.enrich_rows(sheet_frame(sample_rows)))
+    return Leads.Dataset(df, 1, datetime.now())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return Leads.SharedStore(str(tmp_path))
+
+
+def assert_same_version(store, name, ds):
+    df, cube = store.open(name)
+    # cópia: o pandas compara também a classe do array (memmap x ndarray)
+    pd.testing.assert_frame_equal(df.copy(), ds.df)
+    assert cube.consultoras == ds.cube.consultoras
+    for attr in Leads.SharedStore.CUBE_ARRAYS:
+        np.testing.assert_array_equal(getattr(cube, attr), getattr(ds.cube, attr))
+
+
+def test_round_trip(store, ds):
+    name = store.write(ds)
+    assert store.current() == name == ds.content_hash
+    assert store.complete(name)
+    assert_same_version(store, name, ds)
+
+
+def test_incomplete_version_is_rewritten(store, ds):
+    name = store.write(ds)
+    os.remove(os.path.join(store.root, name, 'c000.npy'))
+    assert not store.complete(name)
+    assert store.write(ds) == name
+    assert_same_version(store, name, ds)
+
+
+def test_leftover_directory_that_cannot_be_removed(store, ds, monkeypatch):
+    # pasta parcial com arquivos ainda mapeados (Windows): o rmtree não apaga nada
+    leftover = os.path.join(store.root, ds.content_hash)
+    os.makedirs(leftover)
+    open(os.path.join(leftover, 'c000.npy'), 'wb').close()
+    monkeypatch.setattr(Leads.shutil, 'rmtree', lambda path, ignore_errors=False: None)
+    name = store.write(ds)
+    assert name != ds.content_hash
+    assert store.current() == name
+    assert store.content_hash(name) == ds.content_hash
+    assert_same_version(store, name, ds)